@@ -0,0 +1,4 @@
+# log_tools/__init__.py
+# Access-log analysis helpers for the DevOps Python exercises.
+
+from log_tools.analyzer import LogStats, SketchStats, analyze_file
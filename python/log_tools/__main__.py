@@ -0,0 +1,8 @@
+# log_tools/__main__.py
+# python3 -m log_tools <access logs> - see log_tools/analyzer.py
+
+import sys
+
+from log_tools.analyzer import main
+
+sys.exit(main())
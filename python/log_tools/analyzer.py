@@ -0,0 +1,350 @@
+# log_tools/analyzer.py
+# Counts lines, requests per status code and the busiest clients and paths of
+# Apache/Nginx access logs, splitting big files across a process pool.
+#
+# A file is cut into byte ranges that start and end on a newline, so every
+# range holds whole lines and can be parsed on its own. Each worker reads its
+# range in large blocks and runs one precompiled bytes regex over a whole
+# block at a time (no decoding, no per-line Python loop); the matches feed
+# Counters through C-level updates. The partial LogStats of all ranges are
+# added up in the parent and the top entries picked with a heap.
+#
+# Lines are expected in the common/combined log format:
+#   10.0.0.6 - - [18/Oct/2026:10:00:41 +0000] "GET /index.html HTTP/1.1" 200 593 ...
+# Lines that do not match are counted as malformed.
+#
+# With --sketch, clients and paths are not counted exactly but summarized in
+# fixed-size, mergeable sketches (log_tools.sketches): distinct counts,
+# top-k with error bounds, and response-time percentiles from a trailing
+# $request_time field when the lines have one.
+#
+#   python3 -m log_tools testfiles/access.log --top 5
+#   python3 -m log_tools /var/log/nginx/access.log* --workers 8 --json
+#   python3 -m log_tools /var/log/nginx/access.log --sketch --capacity 500
+#   python3 -m log_tools /var/log/nginx/access.log --state /var/tmp/access.state
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from log_tools.sketches import CountMinSketch, HyperLogLog, SpaceSaving, TDigest
+
+BLOCK_BYTES = 16 * 1024 * 1024
+DEFAULT_TOP = 5
+
+# client, request path, status
+LINE = re.compile(rb'^(\S+) \S+ \S+ \[[^\]\n]*\] "(?:[A-Z]+ )?([^ "\n]*)[^"\n]*" (\d{3})\b', re.MULTILINE)
+# The same, plus a response time in seconds at the end of the line, if any.
+TIMED_LINE = re.compile(LINE.pattern + rb'(?:[^\n]* (\d+\.\d+))?[ \t\r]*$', re.MULTILINE)
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class LogStats:
+    """Counts for some lines of an access log; partial stats add up with merge."""
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.clients = Counter()
+        self.paths = Counter()
+
+    @property
+    def malformed(self):
+        return self.lines - sum(self.statuses.values())
+
+    def add_block(self, block):
+        """Count the complete lines in block (bytes ending with a newline, or the end of the file)."""
+        self.lines += block.count(b'\n') + (bool(block) and not block.endswith(b'\n'))
+        self.bytes += len(block)
+        found = LINE.findall(block)
+        if found:
+            clients, paths, statuses = zip(*found)
+            self.clients.update(clients)
+            self.paths.update(paths)
+            self.statuses.update(statuses)
+
+    def merge(self, other):
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.statuses.update(other.statuses)
+        self.clients.update(other.clients)
+        self.paths.update(other.paths)
+        return self
+
+    @staticmethod
+    def top(counter, k=DEFAULT_TOP):
+        """Return the k most common (key, count) pairs, largest first."""
+        return heapq.nlargest(k, counter.items(), key=lambda item: item[1])
+
+    def report(self, k=DEFAULT_TOP):
+        def text(key):
+            return key.decode('utf-8', 'replace')
+
+        return {
+            'lines': self.lines,
+            'malformed': self.malformed,
+            'bytes': self.bytes,
+            'statuses': {text(status): count for status, count in sorted(self.statuses.items())},
+            'top_clients': [[text(client), count] for client, count in self.top(self.clients, k)],
+            'top_paths': [[text(path), count] for path, count in self.top(self.paths, k)],
+        }
+
+
+class SketchStats:
+    """Like LogStats, with clients and paths kept in fixed-size sketches."""
+
+    def __init__(self, precision=14, width=2048, depth=4, capacity=1000, compression=100):
+        self.lines = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.sketches = {}
+        for name in ('clients', 'paths'):
+            self.sketches[name] = (HyperLogLog(precision), CountMinSketch(width, depth), SpaceSaving(capacity))
+        self.times = TDigest(compression)
+
+    malformed = LogStats.malformed
+
+    def add_block(self, block):
+        self.lines += block.count(b'\n') + (bool(block) and not block.endswith(b'\n'))
+        self.bytes += len(block)
+        found = TIMED_LINE.findall(block)
+        if not found:
+            return
+        clients, paths, statuses, times = zip(*found)
+        self.statuses.update(statuses)
+        # Count the block exactly first, so each sketch sees every key once per block.
+        for name, keys in (('clients', clients), ('paths', paths)):
+            counts = Counter(keys)
+            for sketch in self.sketches[name]:
+                for key, count in counts.items():
+                    sketch.add(key, count)
+        for value, count in Counter(times).items():
+            if value:
+                self.times.add(float(value), count)
+
+    def merge(self, other):
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.statuses.update(other.statuses)
+        for name, sketches in self.sketches.items():
+            for sketch, other_sketch in zip(sketches, other.sketches[name]):
+                sketch.merge(other_sketch)
+        self.times.merge(other.times)
+        return self
+
+    def _top(self, name, k):
+        _, counts, heavy = self.sketches[name]
+        rows = []
+        for key, count, error in heavy.top(k):
+            # Both sketches only over-count: the smaller estimate is the better one.
+            estimate = min(count, counts.estimate(key))
+            rows.append([key.decode('utf-8', 'replace'), estimate, min(error, counts.error())])
+        return rows
+
+    def report(self, k=DEFAULT_TOP):
+        report = {
+            'lines': self.lines,
+            'malformed': self.malformed,
+            'bytes': self.bytes,
+            'statuses': {status.decode(): count for status, count in sorted(self.statuses.items())},
+        }
+        for name in ('clients', 'paths'):
+            distinct = self.sketches[name][0]
+            report[f"unique_{name}"] = {'estimate': distinct.estimate(),
+                                        'relative_error': round(distinct.relative_error(), 4)}
+            # [key, count, count may be over by at most this much]
+            report[f"top_{name}"] = self._top(name, k)
+        report['count_confidence'] = round(self.sketches['clients'][1].confidence(), 4)
+        if self.times.total or self.times._buffer:
+            report['response_time'] = {f"p{round(q * 100)}": round(self.times.quantile(q), 6)
+                                       for q in PERCENTILES}
+        report['sketch_bytes'] = (sum(sketch.nbytes() for sketches in self.sketches.values()
+                                      for sketch in sketches) + self.times.nbytes())
+        return report
+
+
+def split_ranges(path, parts, start=0, size=None):
+    """Cut the file into at most parts (start, end) byte ranges on line boundaries.
+
+    start and size limit the ranges to part of the file; start must be the
+    beginning of a line.
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    if size <= start:
+        return []
+    step = max(1, -(-(size - start) // max(1, parts)))
+    ranges = []
+    with open(path, 'rb') as file:
+        while start < size:
+            end = min(size, start + step)
+            if end < size:
+                file.seek(end)
+                # Move the cut to just after the next newline.
+                while True:
+                    chunk = file.read(64 * 1024)
+                    if not chunk:
+                        end = size
+                        break
+                    newline = chunk.find(b'\n')
+                    if newline >= 0:
+                        end = min(size, file.tell() - len(chunk) + newline + 1)
+                        break
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def new_stats(sketch=None):
+    """Return an empty LogStats, or SketchStats built from the sketch options."""
+    return LogStats() if sketch is None else SketchStats(**sketch)
+
+
+def analyze_range(path, start, end, block_bytes=BLOCK_BYTES, sketch=None):
+    """Return the stats of the lines between byte offsets start and end."""
+    stats = new_stats(sketch)
+    with open(path, 'rb') as file:
+        file.seek(start)
+        tail = b''
+        remaining = end - start
+        while remaining > 0:
+            data = file.read(min(block_bytes, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = tail + data
+            tail = b''
+            if remaining > 0:
+                # Keep the unfinished last line for the next block.
+                cut = data.rfind(b'\n') + 1
+                data, tail = data[:cut], data[cut:]
+            if data:
+                stats.add_block(data)
+        if tail:
+            stats.add_block(tail)
+    return stats
+
+
+def _analyze_task(task):
+    return analyze_range(*task)
+
+
+def analyze_ranges(tasks, workers=None):
+    """Yield the stats of each (path, start, end, block_bytes, sketch) task, in order."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        yield from map(_analyze_task, tasks)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_analyze_task, tasks)
+
+
+def analyze_files(paths, workers=None, block_bytes=BLOCK_BYTES, sketch=None):
+    """Return the merged stats of all paths, parsed in a process pool.
+
+    sketch, when given, is a dict of SketchStats options and selects sketches
+    instead of exact counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    # A few ranges per worker keep them all busy when ranges parse unevenly.
+    tasks = [(path, start, end, block_bytes, sketch)
+             for path in paths for start, end in split_ranges(path, workers * 4)]
+    total = new_stats(sketch)
+    for stats in analyze_ranges(tasks, workers):
+        total.merge(stats)
+    return total
+
+
+def analyze_file(path, workers=None):
+    return analyze_files([path], workers)
+
+
+def _print_report(report):
+    print(f"Total lines: {report['lines']} ({report['malformed']} malformed)")
+    print('Requests per status code:')
+    for status, count in report['statuses'].items():
+        print(f"  {status}: {count}")
+    for name, title in (('clients', 'IP addresses'), ('paths', 'paths')):
+        if f"unique_{name}" in report:
+            unique = report[f"unique_{name}"]
+            print(f"Unique {title}: ~{unique['estimate']} (±{unique['relative_error']:.1%})")
+        print(f"Top {len(report[f'top_{name}'])} {title}:")
+        for row in report[f"top_{name}"]:
+            print(f"  {row[0]}: {row[1]}" + (f" (+{row[2]} at most)" if len(row) > 2 and row[2] else ''))
+    if 'response_time' in report:
+        print('Response time: ' + ', '.join(f"{name} {value:.3f}s" for name, value in report['response_time'].items()))
+    if 'sketch_bytes' in report:
+        print(f"Sketch memory: {report['sketch_bytes'] / 1024:.0f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m log_tools',
+                                     description='Count lines, status codes, top IPs and paths of access logs.')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes (0 = all CPUs, 1 = no pool)')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--state', metavar='FILE',
+                        help='read only what was appended since the last run with this state file '
+                             '(see log_tools/incremental.py)')
+    sketches = parser.add_argument_group('sketches', 'fixed memory, approximate clients and paths')
+    sketches.add_argument('--sketch', action='store_true', help='use sketches instead of exact counters')
+    sketches.add_argument('--precision', type=int, default=14, help='HyperLogLog registers = 2**precision')
+    sketches.add_argument('--width', type=int, default=2048, help='Count-Min counters per row')
+    sketches.add_argument('--depth', type=int, default=4, help='Count-Min rows')
+    sketches.add_argument('--capacity', type=int, default=1000, help='Space-Saving counters')
+    sketches.add_argument('--compression', type=int, default=100, help='t-digest compression')
+    args = parser.parse_args(argv)
+
+    sketch = None
+    if args.sketch:
+        sketch = {'precision': args.precision, 'width': args.width, 'depth': args.depth,
+                  'capacity': args.capacity, 'compression': args.compression}
+    start = time.perf_counter()
+    summary = None
+    if args.state:
+        from log_tools.incremental import update
+
+        per_file, summary = update(args.files, args.state, args.workers or None, sketch=sketch)
+        stats = new_stats(sketch)
+        for file_stats in per_file.values():
+            stats.merge(file_stats)
+        read_bytes = summary.new_bytes
+    else:
+        stats = analyze_files(args.files, args.workers or None, sketch=sketch)
+        read_bytes = stats.bytes
+    elapsed = time.perf_counter() - start
+    report = stats.report(args.top)
+    report['seconds'] = round(elapsed, 3)
+    report['lines_per_second'] = round(stats.lines / elapsed) if elapsed and summary is None else None
+    if summary is not None:
+        report['new_bytes'] = summary.new_bytes
+        report['rotated'] = summary.rotated
+        report['missing'] = summary.missing
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    if summary is not None:
+        for path in summary.rotated:
+            print(f"# {path}: rotated since the last run", file=sys.stderr)
+        for path in summary.missing:
+            print(f"# {path}: not found", file=sys.stderr)
+        print(f"# {stats.lines} lines in total, {read_bytes / 1e6:.1f} MB new in {elapsed:.2f} s",
+              file=sys.stderr)
+    else:
+        print(f"# {stats.lines} lines, {read_bytes / 1e6:.1f} MB in {elapsed:.2f} s "
+              f"({report['lines_per_second'] or 0:,} lines/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+# log_tools/follow.py
+# tail -F for many files at once, as an asyncio async iterator of line batches.
+#
+#   async with Follower(['/var/log/nginx/access.log', ...]) as follower:
+#       async for path, lines in follower:      # lines: [bytes], no newlines
+#           ...
+#
+# On Linux the directories of the followed files are watched with inotify
+# (through ctypes, one watch per directory however many files are in it) and
+# the inotify descriptor is a reader of the event loop, so an idle follower
+# makes no system calls at all. Elsewhere, or with use_inotify=False, the
+# files are stat()ed every poll_interval seconds.
+#
+# An event only marks its file as changed. The bytes are read when a consumer
+# asks for the next batch: up to block_bytes per read with os.pread, split
+# into lines with one bytes.split, the partial last line kept for the next
+# read. A busy file cannot starve the others (changed files are served in
+# turn, block_bytes at a time), and a slow consumer makes the follower read
+# less often and in bigger blocks rather than queue up lines.
+#
+# Rotation:
+#   - rename (logrotate's default): the path gets a new inode. The new file is
+#     read from the start; the old one is still read for `grace` seconds, for
+#     writers that have not reopened their log yet.
+#   - copytruncate: the file gets smaller than what was read; reading starts
+#     again from the beginning.
+# A file that does not exist yet, or was deleted, is picked up when it is
+# created.
+#
+#   python3 -m log_tools.follow /var/log/nginx/*.log
+
+import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+BLOCK_BYTES = 1024 * 1024
+GRACE_SECONDS = 5.0
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+_DIRECTORY_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+_EVENT = struct.Struct('iIII')    # wd, mask, cookie, len; then len bytes of name
+
+
+class Inotify:
+    """A non-blocking inotify descriptor, through libc."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self):
+        """Return the pending events as (wd, mask, name) tuples."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            position = 0
+            while position < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, position)
+                position += _EVENT.size
+                name = data[position:position + length].rstrip(b'\0')
+                position += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _File:
+    __slots__ = ('path', 'fd', 'identity', 'offset', 'pending', 'old', 'old_until', 'stat', 'timer')
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.identity = None    # (st_dev, st_ino) of the open file
+        self.offset = 0
+        self.pending = b''      # read, but no newline after it yet
+        self.old = None         # a _File for the file before a rename
+        self.old_until = 0.0
+        self.stat = None        # what the poller saw last
+        self.timer = None       # call_later handle ending the grace period of old
+
+
+def _take_lines(file, data):
+    # Return the complete lines of file.pending + data; keep the rest as pending.
+    data = file.pending + data
+    newline = data.rfind(b'\n')
+    file.pending = data[newline + 1:]
+    return data[:newline].split(b'\n') if newline >= 0 else []
+
+
+class Follower:
+    """Async iterator of (path, lines) for the lines appended to paths."""
+
+    def __init__(self, paths, from_start=False, block_bytes=BLOCK_BYTES, poll_interval=1.0,
+                 use_inotify=None, grace=GRACE_SECONDS):
+        self.files = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            self.files.setdefault(path, _File(path))
+        self.from_start = from_start
+        self.block_bytes = block_bytes
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.grace = grace
+        self._changed = OrderedDict()   # path -> None, in the order they changed
+        self._wake = None
+        self._inotify = None
+        self._by_name = {}              # (wd, name) -> _File
+        self._poller = None
+        self._loop = None
+        self._timers = set()            # grace-period call_later handles
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        for file in self.files.values():
+            self._open(file, at_end=not self.from_start)
+            self._mark(file)
+        if self.use_inotify is not False:
+            try:
+                self._watch()
+            except OSError:
+                if self._inotify is not None:
+                    self._inotify.close()
+                    self._inotify = None
+                if self.use_inotify:
+                    raise
+        if self._inotify is None:
+            self._poller = self._loop.create_task(self._poll())
+
+    def _watch(self):
+        self._inotify = Inotify()
+        directories = {}
+        for file in self.files.values():
+            directory, name = os.path.split(file.path)
+            if directory not in directories:
+                directories[directory] = self._inotify.add_watch(directory, _DIRECTORY_EVENTS)
+            self._by_name[directories[directory], name] = file
+        self._loop.add_reader(self._inotify.fd, self._on_events)
+
+    def _on_events(self):
+        for wd, mask, name in self._inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: look at everything.
+                for file in self.files.values():
+                    self._mark(file)
+            file = self._by_name.get((wd, name))
+            if file is not None:
+                self._mark(file)
+
+    async def _poll(self):
+        while True:
+            for file in self.files.values():
+                try:
+                    info = os.stat(file.path)
+                    seen = (info.st_dev, info.st_ino, info.st_size, info.st_mtime_ns)
+                except OSError:
+                    seen = None
+                if seen != file.stat:
+                    file.stat = seen
+                    self._mark(file)
+            await asyncio.sleep(self.poll_interval)
+
+    def _mark(self, file):
+        if self._wake is None:
+            # Closed; a late event or timer has nothing left to wake.
+            return
+        self._changed[file.path] = None
+        self._wake.set()
+
+    def _open(self, file, at_end=False):
+        try:
+            fd = os.open(file.path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+        except FileNotFoundError:
+            return False
+        info = os.fstat(fd)
+        file.fd, file.identity = fd, (info.st_dev, info.st_ino)
+        file.offset, file.pending = 0, b''
+        if at_end and info.st_size:
+            # Start after the last complete line, so the first line delivered is whole.
+            size = min(info.st_size, self.block_bytes)
+            newline = os.pread(fd, size, info.st_size - size).rfind(b'\n')
+            file.offset = info.st_size - size + newline + 1 if newline >= 0 else info.st_size
+        return True
+
+    def _retire(self, file):
+        # The path is gone or is another file now: keep reading the old one for a while.
+        if file.old is not None:
+            os.close(file.old.fd)
+        old = file.old = _File(file.path)
+        old.fd, old.offset, old.pending = file.fd, file.offset, file.pending
+        file.old_until = time.monotonic() + self.grace
+        file.fd = file.identity = None
+        if file.timer is not None:
+            file.timer.cancel()
+            self._timers.discard(file.timer)
+        # A little late rather than early, so the last read finds the deadline passed.
+        timer = self._loop.call_later(self.grace + 0.05, self._grace_over, file)
+        self._timers.add(timer)
+        file.timer = timer
+
+    def _grace_over(self, file):
+        self._timers.discard(file.timer)
+        file.timer = None
+        self._mark(file)
+
+    def _read_old(self, file):
+        old = file.old
+        data = os.pread(old.fd, self.block_bytes, old.offset)
+        old.offset += len(data)
+        lines = _take_lines(old, data)
+        if len(data) == self.block_bytes:
+            self._mark(file)
+        elif time.monotonic() >= file.old_until:
+            os.close(old.fd)
+            file.old = None
+            # Nothing more will be appended: the partial last line is a line.
+            if old.pending:
+                lines.append(old.pending)
+        return lines
+
+    def _read(self, file):
+        # Return the next complete lines of file, at most about block_bytes of them.
+        if file.old is not None:
+            lines = self._read_old(file)
+            if lines:
+                self._mark(file)
+                return lines
+        try:
+            info = os.stat(file.path)
+        except FileNotFoundError:
+            info = None
+        if file.fd is not None and (info is None or (info.st_dev, info.st_ino) != file.identity):
+            self._retire(file)
+            self._mark(file)
+            return []
+        if file.fd is None:
+            if info is None or not self._open(file):
+                return []
+        if os.fstat(file.fd).st_size < file.offset:
+            # Truncated (copytruncate): the new contents start at 0.
+            file.offset, file.pending = 0, b''
+        data = os.pread(file.fd, self.block_bytes, file.offset)
+        file.offset += len(data)
+        if len(data) == self.block_bytes:
+            self._mark(file)
+        return _take_lines(file, data)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            while self._changed:
+                path, _ = self._changed.popitem(last=False)
+                file = self.files[path]
+                lines = self._read(file)
+                if lines:
+                    return file.path, lines
+            if self._wake is None:
+                raise StopAsyncIteration
+            self._wake.clear()
+            await self._wake.wait()
+
+    async def close(self):
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self._inotify is not None:
+            self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        for file in self.files.values():
+            for fd in (file.fd, file.old and file.old.fd):
+                if fd is not None:
+                    os.close(fd)
+            file.fd = file.old = None
+        self._wake = None
+
+
+async def _print_lines(args):
+    out = sys.stdout.buffer
+    last = None
+    async with Follower(args.files, from_start=args.from_start, poll_interval=args.interval,
+                        use_inotify=False if args.poll else None) as follower:
+        async for path, lines in follower:
+            if len(follower.files) > 1 and path != last:
+                out.write(f"\n==> {path} <==\n".encode())
+                last = path
+            out.write(b'\n'.join(lines) + b'\n')
+            out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print lines appended to files, following rotation (tail -F).')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--from-start', action='store_true', help='print the existing contents first')
+    parser.add_argument('--poll', action='store_true', help='stat the files instead of using inotify')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_print_lines(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
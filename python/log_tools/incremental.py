@@ -0,0 +1,192 @@
+# log_tools/incremental.py
+# Incremental runs of the log analyzer: only bytes appended since the last
+# run are read.
+#
+# A state file keeps, for every log, a checkpoint: the device and inode it
+# was read from, the offset of its last complete line, the partial line after
+# it, its first bytes, and the stats counted so far. A rerun stats each log
+# and parses only [offset, last newline) of it, in the analyzer's process
+# pool; the totals are the stored stats merged with the new ones.
+#
+# Rotation is noticed when the inode changed (rename rotation: access.log ->
+# access.log.1), or the file shrank or its first bytes changed (copytruncate).
+# The rest of the old contents is then read from the rotated file - found in
+# the same directory by its inode, or for a copy by its first bytes - unless
+# it was compressed or moved away, and the new file from the start.
+#
+# The stats are kept as the analyzer builds them: with --sketch the state
+# stays a fixed size, with exact counts it grows with the distinct clients
+# and paths. The state file is replaced atomically and locked during a run,
+# so overlapping cron runs cannot lose data.
+#
+#   python3 -m log_tools /var/log/nginx/access.log --state /var/tmp/access.state
+
+import fcntl
+import os
+import pickle
+import tempfile
+
+from log_tools.analyzer import BLOCK_BYTES, analyze_range, analyze_ranges, new_stats, split_ranges
+
+HEAD_BYTES = 64
+STATE_VERSION = 1
+
+
+class Checkpoint:
+    """Where the last run stopped reading one log, and what it had counted."""
+
+    def __init__(self, stats, device=0, inode=0):
+        self.device = device
+        self.inode = inode
+        self.offset = 0         # just after the last complete line read
+        self.tail = b''         # the partial line after offset
+        self.head = b''         # the first HEAD_BYTES of the file
+        self.stats = stats
+
+
+class RunSummary:
+    """What an update read: new bytes, and the logs found rotated (renamed or truncated)."""
+
+    def __init__(self):
+        self.new_bytes = 0
+        self.rotated = []
+        self.missing = []
+
+
+def load_state(path, sketch=None):
+    """Return {log path: Checkpoint} from the state file, or {} when there is none.
+
+    State written with other sketch options cannot be merged and is dropped.
+    """
+    try:
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+    except FileNotFoundError:
+        return {}
+    if state.get('version') != STATE_VERSION or state.get('sketch') != sketch:
+        return {}
+    return state['checkpoints']
+
+
+def save_state(path, checkpoints, sketch=None):
+    """Write the checkpoints to path atomically."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump({'version': STATE_VERSION, 'sketch': sketch, 'checkpoints': checkpoints},
+                        file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _read_at(path, offset, size):
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        return file.read(size)
+
+
+def _last_line_end(path, start, size):
+    # Return the offset just after the last newline in [start, size), or -1.
+    with open(path, 'rb') as file:
+        end = size
+        while end > start:
+            begin = max(start, end - 64 * 1024)
+            file.seek(begin)
+            newline = file.read(end - begin).rfind(b'\n')
+            if newline >= 0:
+                return begin + newline + 1
+            end = begin
+    return -1
+
+
+def _rotated(path, checkpoint):
+    # Return the file in path's directory holding what was path at the checkpoint:
+    # the same inode (renamed), or else the same first bytes and at least as
+    # long (copied before a truncate).
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    seen = checkpoint.offset + len(checkpoint.tail)
+    copies = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.name == name or not entry.name.startswith(name):
+            continue
+        try:
+            info = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if (info.st_dev, info.st_ino) == (checkpoint.device, checkpoint.inode):
+            return entry.path
+        if checkpoint.head and info.st_size >= seen and _read_at(entry.path, 0, len(checkpoint.head)) == checkpoint.head:
+            copies.append((info.st_mtime, entry.path))
+    return max(copies)[1] if copies else None
+
+
+def _restart(checkpoint, path, info, summary, sketch):
+    # The log at path is a new file, or was truncated: finish reading the old
+    # contents where rotation left them, and start over.
+    old = _rotated(path, checkpoint)
+    if old is not None:
+        # Its last line is complete now, even without a newline.
+        size = os.path.getsize(old)
+        checkpoint.stats.merge(analyze_range(old, checkpoint.offset, size, sketch=sketch))
+        summary.new_bytes += max(0, size - checkpoint.offset - len(checkpoint.tail))
+    elif checkpoint.tail:
+        checkpoint.stats.add_block(checkpoint.tail)
+    summary.rotated.append(path)
+    checkpoint.device, checkpoint.inode = info.st_dev, info.st_ino
+    checkpoint.offset = 0
+    checkpoint.tail = checkpoint.head = b''
+
+
+def update(paths, state_path, workers=None, block_bytes=BLOCK_BYTES, sketch=None):
+    """Count what was appended to paths since the last update with this state file.
+
+    Returns ({path: stats so far}, RunSummary); the stats cover every run,
+    this one included.
+    """
+    lock = open(state_path + '.lock', 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        checkpoints = load_state(state_path, sketch)
+        summary = RunSummary()
+        workers = workers or os.cpu_count() or 1
+        tasks = []
+        owners = []
+        for path in paths:
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                summary.missing.append(path)
+                continue
+            checkpoint = checkpoints.get(path)
+            if checkpoint is None:
+                checkpoint = checkpoints[path] = Checkpoint(new_stats(sketch), info.st_dev, info.st_ino)
+            elif ((info.st_dev, info.st_ino) != (checkpoint.device, checkpoint.inode)
+                  or info.st_size < checkpoint.offset + len(checkpoint.tail)
+                  or _read_at(path, 0, len(checkpoint.head)) != checkpoint.head):
+                _restart(checkpoint, path, info, summary, sketch)
+            if len(checkpoint.head) < HEAD_BYTES:
+                checkpoint.head = _read_at(path, 0, HEAD_BYTES)
+            seen = checkpoint.offset + len(checkpoint.tail)
+            summary.new_bytes += info.st_size - seen
+            # Only whole lines are counted; the partial last one waits for its newline.
+            end = _last_line_end(path, seen, info.st_size)
+            if end > checkpoint.offset:
+                for start, stop in split_ranges(path, workers * 4, checkpoint.offset, end):
+                    tasks.append((path, start, stop, block_bytes, sketch))
+                    owners.append(checkpoint)
+                checkpoint.offset = end
+            checkpoint.tail = _read_at(path, checkpoint.offset, info.st_size - checkpoint.offset)
+        for checkpoint, stats in zip(owners, analyze_ranges(tasks, workers)):
+            checkpoint.stats.merge(stats)
+        save_state(state_path, checkpoints, sketch)
+        return {path: checkpoints[path].stats for path in paths if path in checkpoints}, summary
+    finally:
+        lock.close()
@@ -0,0 +1,358 @@
+# log_tools/rotate.py
+# Rotates logs once they reach a size, compresses the rotated segments in the
+# background and keeps only the newest of them.
+#
+# Every interval seconds each log is stat()ed (hundreds of stats are cheap;
+# nothing is read). A log at max_bytes or more is rotated to
+# <log>.<YYYYmmdd-HHMMSS>, in one of two ways:
+#   rename        the log is renamed and an empty one created with the same
+#                 mode and owner, then the writer is told to reopen it (a
+#                 signal to the pid in --pidfile, or a --postrotate command;
+#                 one of them is required). Nothing is copied and the writer
+#                 never waits.
+#   copytruncate  for writers that cannot reopen their log: it is copied and
+#                 then truncated in place. The copy catches up with the
+#                 writer until less than copy_window bytes are left, so the
+#                 lines that can be lost between the last copy and the
+#                 truncate are at most a few KiB. A writer as fast as the
+#                 copy is not chased: after copy_passes passes, or one that
+#                 did not gain on it, the rest is copied and truncated. The writer must open the
+#                 log with O_APPEND ("a" mode), or it keeps writing at its
+#                 old offset after the truncate.
+#
+# Rotated segments are compressed (gzip, or zstd when the zstandard package
+# is installed) in a small thread pool whose threads run at the lowest CPU
+# priority, so compression only uses time the writers do not need. After a
+# rename the writer may append to the segment until it has reopened its log,
+# so the newest segment is only compressed at the next rotation (logrotate's
+# delaycompress); a copy is compressed at once. Then the oldest segments are
+# removed beyond --keep of them and beyond --keep-size bytes in total.
+#
+#   python3 -m log_tools.rotate /var/log/app/*.log --max-size 100M --keep 10 --pidfile /run/app.pid
+#   python3 -m log_tools.rotate legacy.log --copytruncate --once
+
+import argparse
+import gzip
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+COPY_WINDOW = 64 * 1024
+COPY_PASSES = 8
+CHUNK_BYTES = 1024 * 1024
+_SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\Z', re.IGNORECASE)
+_UNITS = {'': 1, 'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+
+def parse_size(text):
+    """Return the bytes in a size like 4096, 100M or 1.5G (powers of 1024)."""
+    match = _SIZE.match(text.strip())
+    if not match:
+        raise ValueError(f"not a size: {text!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def _compressor(name):
+    # Return (suffix, open for writing) of the compression name stands for.
+    if name == 'auto':
+        try:
+            import zstandard  # noqa: F401
+            name = 'zstd'
+        except ImportError:
+            name = 'gzip'
+    if name == 'gzip':
+        return '.gz', lambda path, level: gzip.open(path, 'wb', compresslevel=level or 6)
+    if name == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('zstd compression needs the zstandard package') from None
+        return '.zst', lambda path, level: zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=level or 3))
+    if name == 'none':
+        return '', None
+    raise ValueError(f"unknown compression {name!r}, expected one of {['auto', *_SUFFIXES]}")
+
+
+def _low_priority():
+    # Linux schedules threads separately: this only lowers the calling thread.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+def _log(message):
+    print(f"# {time.strftime('%Y-%m-%d %H:%M:%S')} {message}", file=sys.stderr, flush=True)
+
+
+class Rotator:
+    """Rotates, compresses and prunes a set of logs; see the top of the file."""
+
+    def __init__(self, paths, max_bytes=100 << 20, copytruncate=False, pidfile=None,
+                 reopen_signal=signal.SIGHUP, postrotate=None, keep=10, keep_bytes=None,
+                 compression='auto', level=None, workers=1, copy_window=COPY_WINDOW,
+                 copy_passes=COPY_PASSES):
+        if not (copytruncate or pidfile or postrotate):
+            raise ValueError('rename rotation needs a pidfile or a postrotate command to make the writer '
+                             'reopen its log; use copytruncate otherwise')
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.max_bytes = max_bytes
+        self.copytruncate = copytruncate
+        self.pidfile = pidfile
+        self.reopen_signal = reopen_signal
+        self.postrotate = postrotate
+        self.keep = keep
+        self.keep_bytes = keep_bytes
+        self.suffix, self._open_compressed = _compressor(compression)
+        self.level = level
+        self.copy_window = copy_window
+        self.copy_passes = copy_passes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compress',
+                                        initializer=_low_priority)
+        self._locks = {path: threading.Lock() for path in self.paths}
+        self._pending = set()    # segments rotated but not compressed yet
+        self._queued = set()     # ... of which those handed to the pool
+        self._stop = threading.Event()
+
+    # -- rotating ----------------------------------------------------------
+
+    def check(self):
+        """Rotate every log that has reached max_bytes; return the new segments."""
+        rotated = []
+        for path in self.paths:
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                continue
+            if size >= self.max_bytes:
+                try:
+                    rotated.append(self.rotate(path))
+                except OSError as error:
+                    _log(f"{path}: rotation failed: {error}")
+        return rotated
+
+    def _segment_path(self, path):
+        # Several rotations in one second get -1, -2, ... so names keep their order.
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        counts = [count for (other, count), _ in self._segments(path) if other == stamp]
+        if not counts:
+            return f"{path}.{stamp}"
+        return f"{path}.{stamp}-{max(counts) + 1}"
+
+    def rotate(self, path):
+        """Rotate path now; return the segment it was rotated to."""
+        target = self._segment_path(path)
+        start = time.perf_counter()
+        if self.copytruncate:
+            last = self._copy_truncate(path, target)
+            how = f"copied and truncated, {last} bytes in the last copy"
+        else:
+            info = os.stat(path)
+            os.rename(path, target)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, info.st_mode & 0o7777)
+            try:
+                os.fchown(fd, info.st_uid, info.st_gid)
+            except PermissionError:
+                pass
+            os.close(fd)
+            self._reopen()
+            how = 'renamed'
+        _log(f"{path} -> {os.path.basename(target)} ({how} in {time.perf_counter() - start:.3f} s)")
+        with self._locks[path]:
+            self._pending.add(target)
+            if self.copytruncate or self._open_compressed is None:
+                ready = [target]
+            else:
+                # The writer was told to reopen at the rotation before this one.
+                ready = [segment for segment in self.segments(path)
+                         if segment != target and not segment.endswith(('.gz', '.zst'))
+                         and segment not in self._queued]
+            self._queued.update(ready)
+        for segment in ready:
+            self._pool.submit(self._finish, path, segment)
+        return target
+
+    def _copy_truncate(self, path, target):
+        # Copy until the writer is less than copy_window ahead (or copy_passes
+        # passes were made, or a pass did not gain on it), then copy the rest
+        # and truncate at once; return the bytes of that last copy.
+        with open(path, 'rb') as source, open(target, 'wb') as out:
+            shutil.copymode(path, target)
+            copied = 0
+            behind = None
+            for _ in range(self.copy_passes):
+                size = os.fstat(source.fileno()).st_size
+                if size - copied <= self.copy_window or (behind is not None and size - copied >= behind):
+                    break
+                behind = size - copied
+                copied += _copy_range(source, out, copied, size)
+            last = _copy_range(source, out, copied, None)
+            out.flush()
+            # Only what is appended between that read and this truncate is lost.
+            os.truncate(path, 0)
+            return last
+
+    def _reopen(self):
+        if self.pidfile:
+            try:
+                with open(self.pidfile) as file:
+                    os.kill(int(file.read().split()[0]), self.reopen_signal)
+            except (OSError, ValueError, IndexError) as error:
+                _log(f"could not signal the writer in {self.pidfile}: {error}")
+        if self.postrotate:
+            result = subprocess.run(self.postrotate, shell=True)
+            if result.returncode:
+                _log(f"postrotate command exited with {result.returncode}")
+
+    # -- compressing and pruning (pool threads) ------------------------------
+
+    def _finish(self, path, segment):
+        try:
+            if self._open_compressed is not None:
+                self._compress(segment)
+        except Exception as error:
+            _log(f"{segment}: {type(error).__name__}: {error}")
+        with self._locks[path]:
+            self._pending.discard(segment)
+            self._queued.discard(segment)
+            try:
+                self.prune(path)
+            except OSError as error:
+                _log(f"{path}: pruning failed: {error}")
+
+    def _compress(self, segment):
+        compressed = segment + self.suffix
+        temp = compressed + '.tmp'
+        start = time.perf_counter()
+        try:
+            with open(segment, 'rb') as source, self._open_compressed(temp, self.level) as out:
+                shutil.copyfileobj(source, out, CHUNK_BYTES)
+            shutil.copystat(segment, temp)
+            os.replace(temp, compressed)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        before = os.path.getsize(segment)
+        os.remove(segment)
+        _log(f"{os.path.basename(segment)}: {before / 1e6:.1f} MB -> {os.path.getsize(compressed) / 1e6:.1f} MB "
+             f"in {time.perf_counter() - start:.1f} s")
+        return compressed
+
+    @staticmethod
+    def _segments(path):
+        # [((stamp, count), segment path)] of the rotated segments of path, oldest first.
+        directory, name = os.path.split(os.path.abspath(path))
+        pattern = re.compile(re.escape(name) + r'\.(\d{8}-\d{6})(?:-(\d+))?(?:\.gz|\.zst)?\Z')
+        found = []
+        for entry in os.scandir(directory):
+            match = pattern.match(entry.name)
+            if match:
+                found.append(((match.group(1), int(match.group(2) or 0)), entry.path))
+        return sorted(found)
+
+    def segments(self, path):
+        """Return the rotated segments of path, oldest first."""
+        return [segment for _, segment in self._segments(path)]
+
+    def prune(self, path):
+        """Remove the oldest segments of path beyond keep and keep_bytes; return them.
+
+        Segments still waiting to be compressed count towards keep but are
+        never removed, and their size only counts once they are compressed.
+        """
+        segments = self.segments(path)
+        sizes = [0 if segment in self._pending else os.path.getsize(segment) for segment in segments]
+        removed = []
+        left = len(segments)
+        total = sum(sizes)
+        for index, (segment, size) in enumerate(zip(segments, sizes)):
+            over_count = self.keep is not None and left > self.keep
+            over_bytes = self.keep_bytes is not None and total > self.keep_bytes
+            # The newest segment is always kept, however big it is.
+            if index == len(segments) - 1 or not (over_count or over_bytes):
+                break
+            if segment in self._pending:
+                continue
+            os.remove(segment)
+            removed.append(segment)
+            left -= 1
+            total -= size
+        if removed:
+            _log(f"{os.path.basename(path)}: removed {len(removed)} old segments")
+        return removed
+
+    # -- running -------------------------------------------------------------
+
+    def run(self, interval=5.0):
+        """Check the logs every interval seconds until stop() is called."""
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        """Wait for the compressions already queued, then free the pool."""
+        self._pool.shutdown(wait=True)
+
+
+def _copy_range(source, out, start, end):
+    # Copy source[start:end] (to its current end if end is None) to out.
+    source.seek(start)
+    copied = 0
+    while end is None or start + copied < end:
+        data = source.read(CHUNK_BYTES if end is None else min(CHUNK_BYTES, end - start - copied))
+        if not data:
+            break
+        out.write(data)
+        copied += len(data)
+    return copied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rotate logs by size, compress and prune the rotated segments.')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--max-size', default='100M', help='rotate at this size (default: 100M)')
+    parser.add_argument('--copytruncate', action='store_true', help='copy and truncate instead of renaming')
+    parser.add_argument('--pidfile', help='signal this process to reopen its logs after a rename')
+    parser.add_argument('--signal', default='HUP', help='signal to send (default: HUP)')
+    parser.add_argument('--postrotate', metavar='COMMAND', help='command to run after a rename')
+    parser.add_argument('--keep', type=int, default=10, help='rotated segments to keep per log')
+    parser.add_argument('--keep-size', help='total size of the segments to keep per log, e.g. 1G')
+    parser.add_argument('--compress', default='auto', choices=['auto', *_SUFFIXES],
+                        help='auto: zstd when the zstandard package is installed, else gzip')
+    parser.add_argument('--level', type=int, help='compression level')
+    parser.add_argument('--workers', type=int, default=1, help='compression threads')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between size checks')
+    parser.add_argument('--once', action='store_true', help='check once, wait for compression and exit')
+    args = parser.parse_args(argv)
+    try:
+        reopen_signal = getattr(signal, 'SIG' + args.signal.upper().removeprefix('SIG'))
+        rotator = Rotator(args.files, parse_size(args.max_size), args.copytruncate, args.pidfile, reopen_signal,
+                          args.postrotate, args.keep, args.keep_size and parse_size(args.keep_size),
+                          args.compress, args.level, args.workers)
+    except (ValueError, AttributeError) as error:
+        parser.error(str(error))
+
+    if args.once:
+        rotator.check()
+    else:
+        for name in ('SIGINT', 'SIGTERM'):
+            signal.signal(getattr(signal, name), lambda *_: rotator.stop())
+        _log(f"watching {len(rotator.paths)} logs, rotating at {args.max_size}")
+        rotator.run(args.interval)
+    rotator.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
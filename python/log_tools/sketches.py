@@ -0,0 +1,254 @@
+# log_tools/sketches.py
+# Fixed-size summaries for logs with too many distinct keys to count exactly.
+#
+#   HyperLogLog     number of distinct keys (clients, paths); 2**p one-byte
+#                   registers, standard error 1.04 / sqrt(2**p)
+#   CountMinSketch  count of any key, never under-estimated; depth rows of
+#                   width counters, over by at most e/width * total with
+#                   probability 1 - exp(-depth)
+#   SpaceSaving     the heaviest keys; capacity counters, each count over by
+#                   at most its recorded error (<= total / capacity)
+#   TDigest         quantiles of a stream of numbers (response times); about
+#                   compression centroids, most accurate in the tails
+#
+# Every sketch has add(key or value, count), merge(other) for combining the
+# sketches of several files or workers built with the same parameters,
+# nbytes() and an error bound next to its estimates. Keys are bytes and are
+# hashed with blake2b, not hash(), so the sketches of different processes
+# agree.
+
+import hashlib
+import heapq
+import math
+import sys
+from array import array
+from bisect import bisect_left
+
+
+def hash64(key):
+    """Return a 64-bit hash of bytes that is the same in every process."""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """Distinct-count estimator with 2**precision registers."""
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError('precision must be between 4 and 18')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key, count=1):
+        value = hash64(key)
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge HyperLogLogs of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty.
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def nbytes(self):
+        return len(self.registers)
+
+
+class CountMinSketch:
+    """Point counts of keys in depth x width counters."""
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = [array('Q', bytes(8 * width)) for _ in range(depth)]
+        self.total = 0
+
+    def _columns(self, key):
+        # Kirsch-Mitzenmacher: depth hash functions from two halves of one hash.
+        value = hash64(key)
+        first, second = value & 0xFFFFFFFF, value >> 32
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        self.total += count
+        for row, column in zip(self.table, self._columns(key)):
+            row[column] += count
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.table, self._columns(key)))
+
+    def error(self):
+        """Over-estimate bound, holding with probability confidence()."""
+        return math.ceil(math.e / self.width * self.total)
+
+    def confidence(self):
+        return 1 - math.exp(-self.depth)
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('cannot merge Count-Min sketches of different shapes')
+        for row, other_row in zip(self.table, other.table):
+            for column, count in enumerate(other_row):
+                if count:
+                    row[column] += count
+        self.total += other.total
+        return self
+
+    def nbytes(self):
+        return sum(row.itemsize * len(row) for row in self.table)
+
+
+class SpaceSaving:
+    """The capacity heaviest keys, each with (count, error)."""
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}      # key -> [count, error]
+        self._heap = []       # (count, key), possibly stale
+        self.total = 0
+
+    def add(self, key, count=1):
+        self.total += count
+        entry = self.counts.get(key)
+        if entry is None:
+            if len(self.counts) < self.capacity:
+                entry = self.counts[key] = [0, 0]
+            else:
+                # Replace the smallest counter; the newcomer may have had up to its count.
+                smallest, evicted = self._pop_smallest()
+                del self.counts[evicted]
+                entry = self.counts[key] = [smallest, smallest]
+        entry[0] += count
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(entry[0], key) for key, entry in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_smallest(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self.counts.get(key)
+            if entry is not None and entry[0] == count:
+                return count, key
+
+    def top(self, k):
+        """Return the k heaviest (key, count, error), largest first."""
+        return [(key, entry[0], entry[1])
+                for key, entry in heapq.nlargest(k, self.counts.items(), key=lambda item: item[1][0])]
+
+    def merge(self, other):
+        # Keys missing from one summary may have had up to its smallest count there.
+        floor = min((entry[0] for entry in self.counts.values()), default=0) \
+            if len(self.counts) >= self.capacity else 0
+        other_floor = min((entry[0] for entry in other.counts.values()), default=0) \
+            if len(other.counts) >= other.capacity else 0
+        merged = {}
+        for key in self.counts.keys() | other.counts.keys():
+            count, error = self.counts.get(key, (floor, floor))
+            other_count, other_error = other.counts.get(key, (other_floor, other_floor))
+            merged[key] = [count + other_count, error + other_error]
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self.counts = dict(kept)
+        self._heap = [(entry[0], key) for key, entry in kept]
+        heapq.heapify(self._heap)
+        self.total += other.total
+        return self
+
+    def nbytes(self):
+        return (sys.getsizeof(self.counts) + sys.getsizeof(self._heap)
+                + sum(sys.getsizeof(key) for key in self.counts))
+
+
+class TDigest:
+    """Streaming quantiles: centroids merged under the k1 scale function."""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.total = 0
+        self._buffer = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, count=1):
+        self._buffer.append((value, count))
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= 8 * self.compression:
+            self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        means, weights = [], []
+        mean, weight = points[0]
+        seen = 0
+        for value, count in points[1:]:
+            q = (seen + weight + count / 2) / total
+            # A centroid may hold at most 4 * total * q * (1 - q) / compression.
+            if weight + count <= max(1, 4 * total * q * (1 - q) / self.compression):
+                mean += (value - mean) * count / (weight + count)
+                weight += count
+            else:
+                means.append(mean)
+                weights.append(weight)
+                seen += weight
+                mean, weight = value, count
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights, self.total = means, weights, total
+
+    def quantile(self, q):
+        self._compress()
+        if not self.weights:
+            return None
+        if len(self.weights) == 1:
+            return self.means[0]
+        target = q * self.total
+        # Each centroid's mean sits at the middle of its weight.
+        cumulative = []
+        seen = 0
+        for weight in self.weights:
+            cumulative.append(seen + weight / 2)
+            seen += weight
+        index = bisect_left(cumulative, target)
+        if index == 0:
+            return self.min + (self.means[0] - self.min) * (target / cumulative[0] if cumulative[0] else 0)
+        if index == len(cumulative):
+            rest = self.total - cumulative[-1]
+            return self.means[-1] + (self.max - self.means[-1]) * ((target - cumulative[-1]) / rest if rest else 0)
+        low, high = cumulative[index - 1], cumulative[index]
+        return self.means[index - 1] + (self.means[index] - self.means[index - 1]) * (target - low) / (high - low)
+
+    def merge(self, other):
+        other._compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def nbytes(self):
+        return sys.getsizeof(self.means) + sys.getsizeof(self.weights) + 32 * len(self.means)
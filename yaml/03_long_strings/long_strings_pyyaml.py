@@ -1,9 +1,12 @@
-import yaml
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.loaders import get_loader
 
 def read_yaml(file_path):
     with open(file_path, 'r') as file:
-        return yaml.safe_load(file)
+        return get_loader('pyyaml').load(file)
 
 def display_data(data):
     for key, value in data.items():
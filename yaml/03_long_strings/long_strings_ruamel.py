@@ -1,11 +1,12 @@
-from ruamel.yaml import YAML
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.loaders import get_loader
 
 def read_yaml(file_path):
-    yaml = YAML(typ='safe')
-    yaml.version = (1, 2)
     with open(file_path, 'r') as file:
-        return yaml.load(file)
+        return get_loader('ruamel').load(file)
 
 def display_data(data):
     for key, value in data.items():
@@ -1,40 +1,35 @@
-from ruamel.yaml import YAML
-from tabulate import tabulate
+import argparse
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.multidoc import iter_flattened_file
+from yaml_tools.render import print_table
 
 def read_yaml(file_path):
-    yaml = YAML(typ='safe')
-    yaml.version = (1, 2)
     with open(file_path, 'r') as file:
-        return list(yaml.load_all(file))
-
-def display_as_table(data, parent_key=''):
-    rows = []
-    
-    if isinstance(data, dict):
-        for key, value in data.items():
-            full_key = f"{parent_key}.{key}" if parent_key else key
-            rows.extend(display_as_table(value, full_key))
-    elif isinstance(data, list):
-        for index, item in enumerate(data):
-            full_key = f"{parent_key}[{index}]"
-            rows.extend(display_as_table(item, full_key))
-    else:
-        key_type = type(parent_key).__name__
-        value_type = type(data).__name__
-        rows.append([parent_key, data, key_type, value_type])
-    
-    return rows
+        return list(get_loader('ruamel').load_all(file))
 
-def main(file_path):
-    documents = read_yaml(file_path)
-    for i, doc in enumerate(documents):
+def print_documents(tables):
+    for i, table_data in enumerate(tables):
         print(f"\nDocument {i + 1}")
-        table_data = display_as_table(doc)
-        print(tabulate(table_data, headers=['Key', 'Value', 'Key Type', 'Value Type'], tablefmt='grid'))
+        print_table(table_data)
+
+def main(file_path, workers=None):
+    if workers:
+        # Split the memory-mapped file at the document markers and flatten the documents in parallel
+        print_documents(iter_flattened_file(file_path, backend='ruamel', workers=workers))
+    else:
+        print_documents(iter_rows(doc) for doc in read_yaml(file_path))
 
 if __name__ == "__main__":
     # Assuming the YAML file is in the same directory as this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    yaml_file_path = os.path.join(script_dir, 'multidocument.yml')
-    main(yaml_file_path)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?', default=os.path.join(script_dir, 'multidocument.yml'))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='flatten documents in this many processes (0 = all CPUs)')
+    args = parser.parse_args()
+    main(args.file, args.workers if args.workers != 0 else os.cpu_count())
@@ -1,37 +1,20 @@
-import yaml
-from tabulate import tabulate
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.render import print_table
 
 
 def read_yaml(file_path):
     with open(file_path, 'r') as file:
-        return yaml.safe_load(file)
-
-
-def display_as_table(data, parent_key=''):
-    rows = []
-
-    if isinstance(data, dict):
-        for key, value in data.items():
-            full_key = f"{parent_key}.{key}" if parent_key else key
-            rows.extend(display_as_table(value, full_key))
-    elif isinstance(data, list):
-        for index, item in enumerate(data):
-            full_key = f"{parent_key}[{index}]"
-            rows.extend(display_as_table(item, full_key))
-    else:
-        key_type = type(parent_key).__name__
-        value_type = type(data).__name__
-        rows.append([parent_key, data, key_type, value_type])
-
-    return rows
+        return get_loader('pyyaml').load(file)
 
 
 def main(file_path):
     data = read_yaml(file_path)
-    table_data = display_as_table(data)
-    print(tabulate(table_data, headers=[
-          'Key', 'Value', 'Key Type', 'Value Type'], tablefmt='grid'))
+    print_table(iter_rows(data))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.edit import EditError, parse_assignment, patch_text
+from yaml_tools.loaders import get_loader
+
+
+def patch(text, assignment):
+    new_text, _, _ = patch_text(text, [parse_assignment(assignment)])
+    return new_text
+
+
+def test_anchor_is_kept():
+    new_text = patch("a: &x 5\nb: *x\n", 'a=6')
+    assert new_text == "a: &x 6\nb: *x\n"
+    assert get_loader('pyyaml').load(new_text) == {'a': 6, 'b': 6}
+
+
+def test_tag_is_kept():
+    new_text = patch("a: !!str 5\n", 'a=6')
+    assert new_text == "a: !!str 6\n"
+    assert get_loader('pyyaml').load(new_text) == {'a': '6'}
+
+
+def test_value_the_tag_cannot_hold():
+    with pytest.raises(EditError):
+        patch("a: !!int 5\n", 'a=hello')
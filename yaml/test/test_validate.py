@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yaml_tools.validate import compile_schema, validate_file
+
+
+def test_empty_file_is_one_null_document(tmp_path):
+    path = tmp_path / 'empty.yml'
+    path.write_text('# only a comment\n')
+    compiled = compile_schema({'type': 'object', 'required': ['host', 'port']})
+    assert validate_file(str(path), compiled) == [(0, '', 'type', 'expected object, got NoneType')]
@@ -0,0 +1,4 @@
+# yaml_tools/__init__.py
+# Shared helpers for the YAML lesson scripts.
+
+from yaml_tools.flatten import display_as_table, iter_rows
@@ -0,0 +1,8 @@
+# yaml_tools/__main__.py
+# python3 -m yaml_tools <files, directories or globs> - see yaml_tools/cli.py
+
+import sys
+
+from yaml_tools.cli import main
+
+sys.exit(main())
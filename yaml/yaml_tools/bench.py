@@ -0,0 +1,227 @@
+# yaml_tools/bench.py
+# Benchmarks PyYAML and ruamel.yaml on the lesson files, the real-world files
+# and scaled-up copies of them.
+#
+# Every case runs in a freshly spawned interpreter so that peak RSS belongs to
+# that case alone. Results are written as CSV or JSON lines, one row per
+# (file, backend) pair:
+#
+#   python3 -m yaml_tools.bench --sizes 10K,1M,100M --format csv > bench.csv
+#
+# Scaled variants repeat a file as separate documents of one stream (anchors
+# are per document, so they stay valid), plus one synthetic single-document
+# manifest per size.
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+
+YAML_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIELDS = ['file', 'feature', 'size_bytes', 'backend', 'implementation', 'documents', 'rows',
+          'parse_s', 'flatten_s', 'peak_rss_kb', 'rss_growth_kb', 'alloc_peak_kb', 'error']
+
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    """Turn '10K', '1M' or '1G' (or plain bytes) into a number of bytes."""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def corpus(root=YAML_ROOT):
+    """Yield (feature, path) for the real files and every lesson file."""
+    for path in sorted(glob.glob(os.path.join(root, '00_real_yaml_files', '*.yml'))):
+        yield os.path.splitext(os.path.basename(path))[0], path
+    for path in sorted(glob.glob(os.path.join(root, '[0-9][0-9]_*', '*.yml'))):
+        feature = os.path.basename(os.path.dirname(path))
+        if feature != '00_real_yaml_files':
+            yield feature, path
+
+
+def scale_file(source, target, size):
+    """Write copies of source as documents of one stream until size bytes."""
+    with open(source, 'r') as file:
+        text = file.read()
+    if not text.endswith('\n'):
+        text += '\n'
+    # Files that already hold several documents are repeated as they are.
+    block = text if '\n---' in '\n' + text else '---\n' + text
+    written = 0
+    with open(target, 'w') as out:
+        while written < size:
+            out.write(block)
+            written += len(block)
+    return target
+
+
+def synthetic_manifest(target, size):
+    """Write one large document shaped like a `kubectl get -o yaml` list."""
+    written = 0
+    with open(target, 'w') as out:
+        out.write('apiVersion: v1\nkind: List\nitems:\n')
+        index = 0
+        while written < size:
+            item = (f"- apiVersion: apps/v1\n"
+                    f"  kind: Deployment\n"
+                    f"  metadata:\n"
+                    f"    name: service-{index}\n"
+                    f"    labels: {{app: service-{index}, tier: backend}}\n"
+                    f"    creationTimestamp: 2024-01-01T00:00:00Z\n"
+                    f"  spec:\n"
+                    f"    replicas: {index % 5 + 1}\n"
+                    f"    template:\n"
+                    f"      spec:\n"
+                    f"        containers:\n"
+                    f"          - name: app\n"
+                    f"            image: registry.example.com/service-{index}:1.{index % 100}\n"
+                    f"            ports: [{{containerPort: 8080}}]\n"
+                    f"            env:\n"
+                    f"              - {{name: DEBUG, value: 'false'}}\n"
+                    f"              - {{name: RATIO, value: '0.{index % 10}'}}\n")
+            out.write(item)
+            written += len(item)
+            index += 1
+    return target
+
+
+def measure(path, backend, prefer_c, allocations):
+    """Parse and flatten path once and return one result row. Runs in a child."""
+    loader = get_loader(backend, prefer_c)
+    result = {'implementation': loader.implementation}
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(path, 'r') as file:
+        start = time.perf_counter()
+        documents = list(loader.load_all(file))
+        result['parse_s'] = round(time.perf_counter() - start, 6)
+    start = time.perf_counter()
+    rows = 0
+    for document in documents:
+        for _ in iter_rows(document):
+            rows += 1
+    result['flatten_s'] = round(time.perf_counter() - start, 6)
+    result['documents'] = len(documents)
+    result['rows'] = rows
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result['peak_rss_kb'] = peak_kb
+    result['rss_growth_kb'] = peak_kb - baseline_kb
+    if allocations:
+        import tracemalloc
+
+        del documents
+        tracemalloc.start()
+        with open(path, 'r') as file:
+            for document in loader.load_all(file):
+                for _ in iter_rows(document):
+                    pass
+        result['alloc_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def _child(conn, path, backend, prefer_c, allocations):
+    try:
+        conn.send(measure(path, backend, prefer_c, allocations))
+    except Exception as error:
+        conn.send({'error': f"{type(error).__name__}: {error}".splitlines()[0]})
+    finally:
+        conn.close()
+
+
+def run_case(path, backend, prefer_c, allocations=True, repeat=1):
+    """Measure one case in fresh interpreters and keep the fastest run."""
+    context = multiprocessing.get_context('spawn')
+    best = None
+    for _ in range(repeat):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_child, args=(sender, path, backend, prefer_c, allocations))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = {'error': f"worker exited with code {process.exitcode}"}
+        process.join()
+        if 'error' in result:
+            return result
+        if best is None or result['parse_s'] + result['flatten_s'] < best['parse_s'] + best['flatten_s']:
+            best = result
+    return best
+
+
+def backend_variants(backends):
+    """Yield (backend, prefer_c) pairs, skipping C runs that would fall back."""
+    for backend in backends:
+        yield backend, False
+        if not get_loader(backend, True).fallback:
+            yield backend, True
+
+
+def cases(sizes, workdir):
+    """Yield (feature, path, generated) for the corpus and its scaled variants."""
+    files = list(corpus())
+    for feature, path in files:
+        yield feature, path, False
+    for size in sizes:
+        for feature, path in files:
+            name = f"{os.path.splitext(os.path.basename(path))[0]}-{size}.yml"
+            yield feature, scale_file(path, os.path.join(workdir, name), size), True
+        yield 'synthetic_manifest', synthetic_manifest(os.path.join(workdir, f"manifest-{size}.yml"), size), True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare YAML backends on the lesson corpus.')
+    parser.add_argument('--sizes', default='10K,1M',
+                        help='comma separated sizes of scaled variants, e.g. 10K,1M,100M,1G')
+    parser.add_argument('--backends', default='pyyaml,ruamel')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case, the fastest is kept')
+    parser.add_argument('--no-alloc', action='store_true',
+                        help='skip the tracemalloc pass (it is slow on big files)')
+    parser.add_argument('--workdir', help='keep generated files here instead of a temp dir')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    variants = list(backend_variants([b.strip() for b in args.backends.split(',')]))
+    if args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        emit = writer.writerow
+    else:
+        def emit(row):
+            print(json.dumps(row))
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='yaml-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        for feature, path, generated in cases(sizes, workdir):
+            for backend, prefer_c in variants:
+                row = {'file': os.path.relpath(path, YAML_ROOT) if not generated else os.path.basename(path),
+                       'feature': feature, 'size_bytes': os.path.getsize(path), 'backend': backend}
+                row.update(run_case(path, backend, prefer_c, not args.no_alloc, args.repeat))
+                emit(row)
+                sys.stdout.flush()
+            # Scaled copies can be huge; only one is on disk at a time.
+            if generated and not args.workdir:
+                os.remove(path)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# yaml_tools/cache.py
+# On-disk cache of flattened rows, keyed by file content and backend.
+#
+# CI runs the same read_yaml -> display_as_table pipeline over files that
+# rarely change. flatten_file hashes the bytes of a file and, when the same
+# content was flattened before with the same backend, returns the stored rows
+# without parsing anything.
+#
+# Entries are pickled row lists behind a small versioned header, written
+# atomically, one file per entry. The least recently used entries are removed
+# once the directory grows past max_bytes.
+#
+# The cache directory must only be writable by you: entries are unpickled.
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.mmapio import mapped
+
+# Bump when the row format or the flattening rules change.
+CACHE_VERSION = 1
+_MAGIC = b'YTC'
+_HEADER = _MAGIC + bytes([CACHE_VERSION])
+_SUFFIX = '.rows'
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'yaml_tools')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ParseCache:
+    """LRU cache of flattened documents stored under directory."""
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or os.environ.get('YAML_TOOLS_CACHE') or DEFAULT_DIRECTORY
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        # name -> size, oldest access first (file mtimes carry it across runs)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._bytes = sum(self._index.values())
+        self._evict()
+
+    @staticmethod
+    def key(digest, backend):
+        return f"{digest}-{backend}{_SUFFIX}"
+
+    def get(self, digest, backend):
+        """Return the stored documents, or None when absent or unreadable."""
+        name = self.key(digest, backend)
+        if name not in self._index:
+            self.misses += 1
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if not data.startswith(_HEADER):
+                raise ValueError('stale cache entry')
+            documents = pickle.loads(data[len(_HEADER):])
+            os.utime(path)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            self._discard(name)
+            self.misses += 1
+            return None
+        self._index.move_to_end(name)
+        self.hits += 1
+        return documents
+
+    def put(self, digest, backend, documents):
+        name = self.key(digest, backend)
+        data = _HEADER + pickle.dumps(documents, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, os.path.join(self.directory, name))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._bytes += len(data) - self._index.pop(name, 0)
+        self._index[name] = len(data)
+        self._evict()
+
+    def clear(self):
+        for name in list(self._index):
+            self._discard(name)
+
+    @property
+    def size(self):
+        return self._bytes
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            self._discard(next(iter(self._index)))
+
+    def _discard(self, name):
+        self._bytes -= self._index.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def flatten_file(file_path, backend='pyyaml', cache=None):
+    """Return a list with the rows of every document in file_path.
+
+    With a cache, unchanged content is served from it instead of being parsed.
+    """
+    # Hash and parse straight from a memory map: no bytes copy of the file.
+    with mapped(file_path) as content:
+        digest = None
+        if cache is not None:
+            digest = hashlib.sha256(content).hexdigest()
+            documents = cache.get(digest, backend)
+            if documents is not None:
+                return documents
+        documents = [list(iter_rows(document)) for document in get_loader(backend).load_all(content)]
+    if cache is not None:
+        cache.put(digest, backend, documents)
+    return documents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flatten YAML files through the parse cache.')
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument('--clear', action='store_true', help='empty the cache first')
+    args = parser.parse_args(argv)
+
+    cache = ParseCache(args.cache_dir, args.max_bytes)
+    if args.clear:
+        cache.clear()
+    for file_path in args.files:
+        hits = cache.hits
+        start = time.perf_counter()
+        documents = flatten_file(file_path, args.backend, cache)
+        elapsed = time.perf_counter() - start
+        status = 'hit' if cache.hits > hits else 'miss'
+        rows = sum(len(rows) for rows in documents)
+        print(f"{file_path}\t{status}\t{rows} rows\t{elapsed * 1000:.2f} ms")
+    print(f"{cache.hits} hits, {cache.misses} misses, {cache.size} bytes in {cache.directory}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# yaml_tools/cli.py
+# One entry point for flattening many YAML files at once.
+#
+# The lesson scripts each read one hard-coded file, so auditing a directory of
+# manifests means one interpreter (and one yaml/ruamel import) per file. Here
+# the targets - files, directories or globs - are expanded with os.scandir and
+# handed in small chunks to a process pool. Every worker loads its parser once
+# in the pool initializer and keeps it for all the files it is given.
+#
+# Results come back in file order and go to one output stream: a summary line
+# per file (the default), or every row with its file and document number in
+# any of the yaml_tools.render formats. Per-file timing is measured inside the
+# worker, so it is parse + flatten time without the queueing.
+#
+#   python3 -m yaml_tools 00_real_yaml_files '**/*.yaml' --workers 4
+#   python3 -m yaml_tools manifests/ --format ndjson --cache > rows.ndjson
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import deque
+
+from yaml_tools.render import FORMATS, HEADERS, writer
+
+EXTENSIONS = ('.yml', '.yaml')
+SUMMARY_FIELDS = ['file', 'documents', 'rows', 'ms', 'error']
+
+# Set by _init_worker in every pool process (and in-process for --workers 1).
+_worker = {}
+
+
+def _walk(directory, extensions):
+    stack = [directory]
+    while stack:
+        path = stack.pop()
+        try:
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        directories = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+            elif entry.name.endswith(extensions) and entry.is_file():
+                yield entry.path
+        # Walk subdirectories in name order.
+        stack.extend(reversed(directories))
+
+
+def iter_files(targets, extensions=EXTENSIONS):
+    """Yield every YAML file named by targets (files, directories or globs) once."""
+    seen = set()
+    for target in targets:
+        if os.path.isdir(target):
+            paths = _walk(target, extensions)
+        elif glob.has_magic(target):
+            paths = (path for match in sorted(glob.iglob(target, recursive=True))
+                     for path in (_walk(match, extensions) if os.path.isdir(match) else [match]))
+        else:
+            # Named files are taken as they are; a missing one is reported as an error.
+            paths = [target]
+        for path in paths:
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+
+def _init_worker(backend, keep_rows, cache=False, cache_dir=None):
+    from yaml_tools.cache import ParseCache
+    from yaml_tools.loaders import get_loader
+
+    # Import and build the parser now, not on the first file.
+    get_loader(backend)
+    _worker['backend'] = backend
+    _worker['keep_rows'] = keep_rows
+    _worker['cache'] = ParseCache(cache_dir) if cache else None
+
+
+def _inspect(paths):
+    from yaml_tools.cache import flatten_file
+
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        documents, error = None, None
+        try:
+            documents = flatten_file(path, _worker['backend'], _worker['cache'])
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}".splitlines()[0]
+        elapsed = time.perf_counter() - start
+        counts = [len(rows) for rows in documents] if documents is not None else []
+        results.append((path, documents if _worker['keep_rows'] else None, counts, elapsed, error))
+    return results
+
+
+def iter_chunks(paths, size):
+    """Yield lists of up to size paths, for handing to pool workers."""
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def inspect_files(paths, backend='pyyaml', workers=None, keep_rows=True, cache=False, cache_dir=None,
+                  chunk=16):
+    """Yield (path, documents, row_counts, seconds, error) for every path, in order.
+
+    documents is a list with the rows of each document, or None when the file
+    failed or keep_rows is false.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(paths, chunk)
+    if workers == 1:
+        _init_worker(backend, keep_rows, cache, cache_dir)
+        for paths in chunks:
+            yield from _inspect(paths)
+        return
+    # concurrent.futures is slow to import and only needed with a pool.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(backend, keep_rows, cache, cache_dir)) as pool:
+        pending = deque()
+        for paths in chunks:
+            pending.append(pool.submit(_inspect, paths))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m yaml_tools',
+                                     description='Flatten many YAML files with a pool of warm workers.')
+    parser.add_argument('targets', nargs='+', help='files, directories or globs (quote them)')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--workers', type=int, default=0, help='worker processes (0 = all CPUs, 1 = no pool)')
+    parser.add_argument('--format', choices=['summary'] + FORMATS, default='summary',
+                        help='one line per file, or every row in a table format')
+    parser.add_argument('--cache', action='store_true', help='serve unchanged files from the parse cache')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--chunk', type=int, default=16, help='files handed to a worker at a time')
+    args = parser.parse_args(argv)
+
+    summary = args.format == 'summary'
+    if summary:
+        table = writer('tsv', headers=SUMMARY_FIELDS)
+    else:
+        table = writer(args.format, headers=['File', 'Document'] + HEADERS)
+
+    start = time.perf_counter()
+    files = errors = rows = 0
+    busy = 0.0
+    results = inspect_files(iter_files(args.targets), args.backend, args.workers or None,
+                            keep_rows=not summary, cache=args.cache or bool(args.cache_dir),
+                            cache_dir=args.cache_dir, chunk=args.chunk)
+    for path, documents, counts, elapsed, error in results:
+        files += 1
+        errors += error is not None
+        rows += sum(counts)
+        busy += elapsed
+        if summary:
+            table.write((path, len(counts), sum(counts), round(elapsed * 1000, 3), error))
+            continue
+        print(f"# {path}: {len(counts)} documents, {sum(counts)} rows, {elapsed * 1000:.2f} ms"
+              + (f", {error}" if error else ''), file=sys.stderr)
+        for number, document in enumerate(documents or []):
+            for row in document:
+                table.write((path, number + 1) + tuple(row))
+    table.close()
+    wall = time.perf_counter() - start
+    print(f"# {files} files, {rows} rows, {errors} errors in {wall:.2f} s "
+          f"({busy:.2f} s parsing and flattening)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
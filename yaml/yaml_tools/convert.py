@@ -0,0 +1,364 @@
+# yaml_tools/convert.py
+# Converts between YAML, JSON and XML one document at a time.
+#
+# YAML input is memory-mapped and cut into documents by yaml_tools.mmapio;
+# each document is parsed, written and dropped before the next one is read,
+# and the pages already converted are released. JSON is written with
+# JSONEncoder.iterencode, chunk by chunk, so no document is ever held as one
+# big string. Memory therefore stays around the size of the largest single
+# document, however long the stream is.
+#
+# A single YAML document becomes indented JSON; a stream of several becomes
+# NDJSON, one document per line. Going back, .ndjson/.jsonl input (or
+# --from ndjson) is read line by line and becomes a "---" separated stream.
+#
+# XML follows the shape of 01_sample_yaml_file/sample.xml: child elements
+# become keys, an element whose children all repeat one tag becomes a list
+# (<hobbies><hobby>...</hobby></hobbies> is hobbies: [...]), and text that
+# reads as a number, true/false or null is typed. Written XML uses the
+# singular of the key for list items ("hobbies" -> "hobby"). A key that is not
+# a valid tag name ("a b", "2024-01-01") is written as <item key="a b">, and
+# read back as that key. A wrapper with a single child cannot be told apart
+# from a mapping and reads back as one.
+#
+# Keys that are not strings (numbers, booleans, null, dates) are written the
+# way YAML and JSON spell those scalars: 1, true, null, 2024-01-01. Two keys
+# of one mapping that end up spelled the same (1 and "1") are an error, and
+# so are .nan and .inf values, which have no JSON form. Binary values are
+# written to JSON as base64, dates and times in ISO 8601; any other value
+# that JSON cannot hold is an error.
+#
+#   python3 -m yaml_tools.convert 01_sample_yaml_file/sample.yml --to json
+#   python3 -m yaml_tools.convert dump.yml -o dump.ndjson
+
+import argparse
+import base64
+import datetime
+import json
+import math
+import os
+import re
+import sys
+from itertools import chain, islice, repeat
+
+FORMATS = ['yaml', 'json', 'ndjson', 'xml']
+_EXTENSIONS = {'.yml': 'yaml', '.yaml': 'yaml', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson',
+               '.xml': 'xml'}
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:(\.\d+)?([eE][-+]?\d+)?)?\Z')
+_XML_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+_XML_ATTRIBUTE_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+# Tag names written as they are; anything else becomes <item key="...">.
+_XML_NAME = re.compile(r'(?![Xx][Mm][Ll])[A-Za-z_][\w.-]*\Z')
+
+
+def guess_format(path):
+    """Return the format named by the extension of path, or None."""
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+# -- reading ---------------------------------------------------------------
+
+def iter_yaml(path, backend='pyyaml'):
+    from yaml_tools.loaders import get_loader
+    from yaml_tools.mmapio import iter_documents, mapped
+
+    loader = get_loader(backend)
+    with mapped(path) as buffer:
+        documents = iter_documents(buffer, release=True)
+        try:
+            for document in documents:
+                yield loader.load(document)
+        finally:
+            documents.close()
+
+
+def iter_json(path):
+    with open(path, 'rb') as file:
+        yield json.load(file)
+
+
+def iter_ndjson(path):
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _scalar(text):
+    if text is None:
+        return None
+    text = text.strip()
+    if _NUMBER.match(text):
+        return float(text) if '.' in text or 'e' in text or 'E' in text else int(text)
+    return {'true': True, 'false': False, 'null': None, '': None}.get(text, text)
+
+
+def _children_value(pairs):
+    # pairs are the (tag, value) of an element's children, in order.
+    if len(pairs) > 1 and len({tag for tag, _ in pairs}) == 1:
+        return [item for _, item in pairs]
+    value = {}
+    for tag, item in pairs:
+        if tag not in value:
+            value[tag] = item
+        elif isinstance(value[tag], list):
+            value[tag].append(item)
+        else:
+            value[tag] = [value[tag], item]
+    return value
+
+
+def _key(element):
+    # <item key="a b"> stands for a key that is not a valid tag name.
+    if element.tag == 'item' and 'key' in element.attrib:
+        return element.attrib['key']
+    return element.tag
+
+
+def _element_value(element):
+    if len(element) == 0:
+        return _scalar(element.text)
+    return _children_value([(_key(child), _element_value(child)) for child in element])
+
+
+def iter_xml(path):
+    import xml.etree.ElementTree as ElementTree
+
+    # Convert each top-level child as soon as it is complete and drop it
+    # from the tree, so only one of them is held as elements at a time.
+    root = None
+    depth = 0
+    pairs = []
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            pairs.append((_key(element), _element_value(element)))
+            root.remove(element)
+    if root is not None:
+        yield {root.tag: _children_value(pairs) if pairs else _scalar(root.text)}
+
+
+_READERS = {'json': iter_json, 'ndjson': iter_ndjson, 'xml': iter_xml}
+
+
+def iter_documents(path, fmt=None, backend='pyyaml'):
+    """Yield the parsed documents of path one at a time."""
+    fmt = fmt or guess_format(path) or 'yaml'
+    if fmt == 'yaml':
+        return iter_yaml(path, backend)
+    return _READERS[fmt](path)
+
+
+# -- writing ---------------------------------------------------------------
+
+def _yaml_dumper():
+    import yaml
+
+    return getattr(yaml, 'CSafeDumper', None) or yaml.SafeDumper
+
+
+def write_yaml(documents, out):
+    import yaml
+
+    dumper = _yaml_dumper()
+    count = 0
+    for count, data in enumerate(documents, 1):
+        yaml.dump(data, out, Dumper=dumper, sort_keys=False, default_flow_style=False,
+                  allow_unicode=True, explicit_start=count > 1 or None)
+    return count
+
+
+def _key_text(key):
+    # The YAML/JSON spelling of a scalar key, not the Python one ("true", not "True").
+    if type(key) is str:
+        return key
+    if key is None:
+        return 'null'
+    if isinstance(key, bool):
+        return 'true' if key else 'false'
+    if isinstance(key, float):
+        if math.isnan(key):
+            return '.nan'
+        if math.isinf(key):
+            return '.inf' if key > 0 else '-.inf'
+        return repr(key)
+    if isinstance(key, (datetime.date, datetime.time)):
+        return key.isoformat()
+    if isinstance(key, bytes):
+        return base64.b64encode(key).decode('ascii')
+    return str(key)
+
+
+def _json_default(value):
+    # What JSONEncoder cannot write by itself; no str() catch-all, which would
+    # write b'...' or a repr as if it were the data.
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"a {type(value).__name__} value has no JSON spelling")
+
+
+def _json_ready(data):
+    # Replace the keys that are not str by their spelling, in place, and
+    # reject colliding keys and .nan/.inf before any of the document is written.
+    seen = set()
+    stack = [('', data)]
+    while stack:
+        path, node = stack.pop()
+        if isinstance(node, float):
+            if not math.isfinite(node):
+                raise ValueError(f"{node!r} at {path or '<root>'} has no JSON spelling")
+            continue
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, dict):
+            if not all(type(key) is str for key in node):
+                items = {}
+                for key, value in node.items():
+                    text = _key_text(key)
+                    if text in items:
+                        raise ValueError(f"two keys at {path or '<root>'} are both written {text!r}")
+                    items[text] = value
+                node.clear()
+                node.update(items)
+            children = ((f"{path}.{key}" if path else key, value) for key, value in node.items())
+        elif isinstance(node, list):
+            children = ((f"{path}[{index}]", value) for index, value in enumerate(node))
+        else:
+            continue
+        stack.extend(child for child in children if isinstance(child[1], (dict, list, float)))
+    return data
+
+
+def _write_json(data, out, encoder):
+    for chunk in encoder.iterencode(_json_ready(data)):
+        out.write(chunk)
+
+
+def write_json(documents, out, ndjson=None):
+    """Write one indented document, or NDJSON when there are several (or ndjson=True)."""
+    # allow_nan=False: NaN and Infinity are not JSON, so .nan/.inf raise ValueError.
+    compact = json.JSONEncoder(default=_json_default, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    pretty = json.JSONEncoder(default=_json_default, ensure_ascii=False, allow_nan=False, indent=2)
+    documents = iter(documents)
+    # Look one document ahead to know whether the output is a stream.
+    head = list(islice(documents, 2))
+    if ndjson is None:
+        ndjson = len(head) > 1
+    count = 0
+    for count, data in enumerate(chain(head, documents), 1):
+        if not ndjson and count > 1:
+            raise ValueError('several documents cannot be written as one JSON value; use ndjson')
+        _write_json(data, out, compact if ndjson else pretty)
+        out.write('\n')
+    return count
+
+
+def _singular(key):
+    key = str(key)
+    if key.endswith('ies') and len(key) > 3:
+        key = key[:-3] + 'y'
+    elif key.endswith('s') and not key.endswith('ss') and len(key) > 1:
+        key = key[:-1]
+    else:
+        return 'item'
+    return key if _XML_NAME.match(key) else 'item'
+
+
+def _xml_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value).translate(_XML_ESCAPES)
+
+
+def _xml_tag(key):
+    # Return (opening tag, name to close it with) for a mapping key.
+    key = _key_text(key)
+    if _XML_NAME.match(key):
+        return f"<{key}>", key
+    return f'<item key="{key.translate(_XML_ATTRIBUTE_ESCAPES)}">', 'item'
+
+
+def write_xml(documents, out):
+    count = 0
+    for count, data in enumerate(documents, 1):
+        if count > 1:
+            raise ValueError('several documents cannot be written as one XML document')
+        if not (isinstance(data, dict) and len(data) == 1):
+            data = {'root': data}
+        # Each frame: (children, indent, closing tag or None)
+        stack = [(iter(data.items()), '', None)]
+        while stack:
+            children, indent, closing = stack[-1]
+            for key, value in children:
+                opening, tag = _xml_tag(key)
+                if isinstance(value, dict):
+                    out.write(f"{indent}{opening}\n")
+                    stack.append((iter(value.items()), indent + '  ', tag))
+                    break
+                if isinstance(value, list):
+                    out.write(f"{indent}{opening}\n")
+                    item = _singular(key)
+                    stack.append((zip(repeat(item), value), indent + '  ', tag))
+                    break
+                out.write(f"{indent}{opening}{_xml_text(value)}</{tag}>\n")
+            else:
+                stack.pop()
+                if closing is not None:
+                    out.write(f"{indent[:-2]}</{closing}>\n")
+    return count
+
+
+def convert(source, target_format, out, source_format=None, backend='pyyaml'):
+    """Convert the documents in the file at source to target_format on out.
+
+    Returns the number of documents written.
+    """
+    documents = iter_documents(source, source_format, backend)
+    if target_format == 'yaml':
+        return write_yaml(documents, out)
+    if target_format == 'xml':
+        return write_xml(documents, out)
+    return write_json(documents, out, ndjson=True if target_format == 'ndjson' else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert YAML, JSON and XML files one document at a time.')
+    parser.add_argument('input')
+    parser.add_argument('-o', '--output', help='output file (default: standard output)')
+    parser.add_argument('--from', dest='source_format', choices=FORMATS,
+                        help='input format (default: from the extension)')
+    parser.add_argument('--to', dest='target_format', choices=FORMATS,
+                        help='output format (default: from --output, else json for YAML input, yaml otherwise)')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    args = parser.parse_args(argv)
+
+    source_format = args.source_format or guess_format(args.input) or 'yaml'
+    target_format = args.target_format or (args.output and guess_format(args.output))
+    if not target_format:
+        target_format = 'json' if source_format == 'yaml' else 'yaml'
+    try:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as out:
+                count = convert(args.input, target_format, out, source_format, args.backend)
+        else:
+            count = convert(args.input, target_format, sys.stdout, source_format, args.backend)
+    except (ValueError, TypeError) as error:
+        # ValueError for colliding keys and .nan/.inf, TypeError for values JSON cannot hold.
+        print(f"{args.input}: {type(error).__name__}: {error}", file=sys.stderr)
+        return 1
+    print(f"# {count} documents, {source_format} -> {target_format}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
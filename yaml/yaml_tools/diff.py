@@ -0,0 +1,214 @@
+# yaml_tools/diff.py
+# Row-level diff between two YAML (or JSON) files.
+#
+# Both files are flattened, the rows of every document are sorted by path,
+# and the two sorted streams are walked side by side in one merge pass. A
+# path on one side only is an added or removed row, a path on both sides
+# with another value is a changed row. Documents are paired by position.
+#
+# List items are matched by position unless an identity key is given:
+#   --key name                  any list of mappings, by their "name"
+#   --key containers=name       only lists under a "containers" key
+# Items are then spelled containers[name=nginx] instead of containers[0], so
+# reordering or inserting a container does not show up as every field of
+# every later container changing. A list whose items do not all carry the
+# key, or carry it twice with the same value, falls back to positions.
+#
+# Sorting keeps at most run_rows rows per document in memory; larger
+# documents are sorted in runs spilled to temporary files and merged back.
+#
+#   python3 -m yaml_tools.diff old.yml new.yml --key containers=name
+
+import argparse
+import heapq
+import pickle
+import sys
+import tempfile
+from itertools import zip_longest
+
+from yaml_tools.flatten import DEFAULT_MAX_ALIAS_ROWS, AliasExpansionError, iter_rows
+from yaml_tools.loaders import RuamelLoader, get_loader
+from yaml_tools.watch import ADDED, CHANGED, REMOVED, format_change
+
+DEFAULT_RUN_ROWS = 1_000_000
+
+_MISSING = object()
+
+
+def parse_identity(specs):
+    """Turn ["name", "containers=name"] into {None: "name", "containers": "name"}."""
+    identity = {}
+    for spec in specs:
+        list_key, _, field = spec.rpartition('=')
+        if not field:
+            raise ValueError(f"empty identity key in {spec!r}")
+        identity[list_key or None] = field
+    return identity
+
+
+def _item_labels(items, field):
+    # "[field=value]" for every item, or None when the items cannot be told
+    # apart by field.
+    if field is None:
+        return None
+    labels = []
+    for item in items:
+        if not isinstance(item, dict) or field not in item or isinstance(item[field], (dict, list)):
+            return None
+        labels.append(f"[{field}={item[field]}]")
+    if len(set(labels)) != len(labels):
+        return None
+    return labels
+
+
+def _mapping_children(mapping, parent_key):
+    for key, value in mapping.items():
+        yield (f"{parent_key}.{key}" if parent_key else key), value, key
+
+
+def _sequence_children(sequence, parent_key, labels):
+    for label, item in zip(labels, sequence):
+        yield f"{parent_key}{label}", item, None
+
+
+def iter_keyed_rows(data, identity, parent_key='', max_alias_rows=DEFAULT_MAX_ALIAS_ROWS):
+    """Yield rows like flatten.iter_rows, spelling list items by identity key.
+
+    Aliased subtrees are walked again at every occurrence (their list items
+    may be spelled differently there); the rows beyond the first occurrence
+    count towards max_alias_rows, as in iter_rows.
+    """
+    if not identity:
+        yield from iter_rows(data, parent_key, max_alias_rows)
+        return
+    default = identity.get(None)
+    active = set()
+    visited = set()
+    replaying = alias_rows = 0
+    # Each frame: [children, id of its container, whether it was seen before]
+    stack = [[iter(((parent_key, data, None),)), None, False]]
+    while stack:
+        frame = stack[-1]
+        for key, value, name in frame[0]:
+            if isinstance(value, dict):
+                children = _mapping_children(value, key)
+            elif isinstance(value, list):
+                labels = _item_labels(value, identity.get(name, default))
+                if labels is None:
+                    labels = [f"[{index}]" for index in range(len(value))]
+                children = _sequence_children(value, key, labels)
+            else:
+                if replaying:
+                    alias_rows += 1
+                    if max_alias_rows is not None and alias_rows > max_alias_rows:
+                        raise AliasExpansionError(f"aliases expand to more than {max_alias_rows} rows (at {key!r})")
+                yield key, value, type(key).__name__, type(value).__name__
+                continue
+            node_id = id(value)
+            if node_id in active:
+                raise AliasExpansionError(f"recursive alias at {key!r}")
+            active.add(node_id)
+            again = node_id in visited
+            visited.add(node_id)
+            replaying += again
+            stack.append([children, node_id, again])
+            break
+        else:
+            stack.pop()
+            active.discard(frame[1])
+            replaying -= frame[2]
+
+
+def _path(row):
+    return str(row[0])
+
+
+def _read_run(file):
+    try:
+        with file:
+            while True:
+                yield from pickle.load(file)
+    except EOFError:
+        pass
+
+
+def sorted_rows(rows, run_rows=DEFAULT_RUN_ROWS):
+    """Yield rows ordered by path, spilling sorted runs to disk past run_rows."""
+    runs = []
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= run_rows:
+            buffer.sort(key=_path)
+            run = tempfile.TemporaryFile()
+            for start in range(0, len(buffer), 4096):
+                pickle.dump(buffer[start:start + 4096], run, pickle.HIGHEST_PROTOCOL)
+            run.seek(0)
+            runs.append(run)
+            buffer = []
+    buffer.sort(key=_path)
+    if not runs:
+        yield from buffer
+        return
+    yield from heapq.merge(*(_read_run(run) for run in runs), buffer, key=_path)
+
+
+def diff_rows(old, new, number=0):
+    """Yield watch-style changes between two path-sorted row streams."""
+    old, new = iter(old), iter(new)
+    before, after = next(old, None), next(new, None)
+    while before is not None or after is not None:
+        if after is None or (before is not None and _path(before) < _path(after)):
+            yield (REMOVED, number, before)
+            before = next(old, None)
+        elif before is None or _path(after) < _path(before):
+            yield (ADDED, number, after)
+            after = next(new, None)
+        else:
+            if before[1:] != after[1:] or type(before[1]) is not type(after[1]):
+                yield (CHANGED, number, before, after)
+            before, after = next(old, None), next(new, None)
+
+
+def diff_documents(old_documents, new_documents, identity=None, run_rows=DEFAULT_RUN_ROWS):
+    """Yield the changes between two sequences of parsed documents, paired by position."""
+    identity = identity or {}
+    for number, (old, new) in enumerate(zip_longest(old_documents, new_documents, fillvalue=_MISSING)):
+        old_rows = () if old is _MISSING else sorted_rows(iter_keyed_rows(old, identity), run_rows)
+        new_rows = () if new is _MISSING else sorted_rows(iter_keyed_rows(new, identity), run_rows)
+        yield from diff_rows(old_rows, new_rows, number)
+
+
+def diff_files(old_path, new_path, identity=None, backend='pyyaml', run_rows=DEFAULT_RUN_ROWS):
+    """Yield the changes from the file at old_path to the file at new_path."""
+    loader = get_loader(backend)
+    # The two files are loaded in turns; a ruamel YAML instance cannot
+    # interleave two loads, so the new file gets one of its own.
+    new_loader = RuamelLoader() if backend == 'ruamel' else loader
+    with open(old_path, 'rb') as old, open(new_path, 'rb') as new:
+        yield from diff_documents(loader.load_all(old), new_loader.load_all(new), identity, run_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the row changes between two YAML or JSON files.')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--key', action='append', default=[], metavar='[LIST=]FIELD',
+                        help='match list items by FIELD instead of position (repeatable)')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--run-rows', type=int, default=DEFAULT_RUN_ROWS,
+                        help='rows sorted in memory before spilling to disk')
+    args = parser.parse_args(argv)
+    try:
+        identity = parse_identity(args.key)
+    except ValueError as error:
+        parser.error(str(error))
+    changes = 0
+    for change in diff_files(args.old, args.new, identity, args.backend, args.run_rows):
+        print(format_change(change))
+        changes += 1
+    return 1 if changes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
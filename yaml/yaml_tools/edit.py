@@ -0,0 +1,358 @@
+# yaml_tools/edit.py
+# Sets scalar values in YAML/JSON files by rewriting only their bytes.
+#
+# Loading a file and dumping it again (ruamel round trip, or the safe
+# loaders, which drop comments altogether) re-serializes every line to change
+# one. Here the file is only composed: the node graph carries the start and
+# end offset of every scalar, so the value at a path is replaced in the text
+# and everything else, comments, quoting, key order and blank lines included,
+# is kept byte for byte.
+#
+# Paths are written the way flatten.iter_rows spells them and may use the
+# wildcards of yaml_tools.index:
+#   spec.template.spec.containers[*].image=nginx:1.27
+#   metadata.*.tier=frontend
+# The new value keeps the quoting of the old one; a value that cannot be
+# written plain is double-quoted. An anchor (&name) or tag (!!str) written
+# before the old value is kept, and a value its standard tag cannot hold is
+# an error. Every document of a stream is edited.
+#
+# The text is always composed with PyYAML (the C composer when libyaml is
+# there), whose nodes carry the marks; ruamel.yaml is only used for the round
+# trip. A path that matches nothing in a file is an error, not "0 changes".
+#
+# A value that cannot be patched in place - a block scalar (| or >), a
+# multi-line or empty plain scalar, or a value reached through an alias or a
+# "<<" merge - makes the whole file go through a ruamel.yaml round trip
+# instead (json for .json files).
+#
+#   python3 -m yaml_tools.edit manifests/ --set 'spec.template.spec.containers[*].image=web:2.0'
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+from yaml_tools.index import ANY_INDEX, ANY_KEY, parse_path
+from yaml_tools.loaders import get_loader
+
+IN_PLACE, ROUND_TRIP = 'in place', 'round trip'
+
+# Text that reads back as the same plain scalar in block and flow context.
+_PLAIN = re.compile(r"[^\s\-?:,\[\]{}#&*!|>'\"%@`](?:[^\n:#,\[\]{}]|:(?! |$)|(?<! )#)*(?<!\s)\Z")
+# The anchor and tag a scalar node's marks start at, before its value.
+_PROPERTIES = re.compile(r"(?:[&!][^\s,\[\]{}]*(?:[ \t]+|\Z))*")
+_STANDARD_TAG = 'tag:yaml.org,2002:'
+
+
+class EditError(ValueError):
+    """Raised when a value cannot be set, in place or by a round trip."""
+
+
+class NoMatchError(EditError):
+    """Raised when none of the paths leads to a value in a file."""
+
+
+class _NeedsRoundTrip(Exception):
+    pass
+
+
+def parse_assignment(text):
+    """Split "path=value" into (path segments, value text)."""
+    path, separator, value = text.partition('=')
+    if not separator or not path:
+        raise EditError(f"expected PATH=VALUE, got {text!r}")
+    return parse_path(path), value
+
+
+def _paths(assignments):
+    # Spell the paths of assignments back for messages.
+    paths = []
+    for segments, _ in assignments:
+        path = ''
+        for segment in segments:
+            if isinstance(segment, int) or segment == ANY_INDEX:
+                path += f"[{segment}]" if isinstance(segment, int) else segment
+            else:
+                path += ('.' if path else '') + str(segment)
+        paths.append(path)
+    return ', '.join(paths)
+
+
+def _follow(node, segments):
+    # Yield the nodes segments lead to, checking that each was written where
+    # it appears (an alias reuses the node of its anchor, earlier in the text).
+    from yaml.nodes import MappingNode, SequenceNode
+
+    nodes = [node]
+    for segment in segments:
+        found = []
+        for parent in nodes:
+            if isinstance(parent, MappingNode):
+                if segment == ANY_INDEX:
+                    continue
+                matched = merged = False
+                for key, value in parent.value:
+                    if key.tag == 'tag:yaml.org,2002:merge':
+                        merged = True
+                    elif segment == ANY_KEY or key.value == str(segment):
+                        if value.start_mark.index < key.end_mark.index:
+                            raise _NeedsRoundTrip('alias')
+                        found.append(value)
+                        matched = True
+                # Keys that only come from a "<<" merge live in another node.
+                if merged and (segment == ANY_KEY or not matched):
+                    raise _NeedsRoundTrip('merge key')
+            elif isinstance(parent, SequenceNode):
+                previous = parent.start_mark.index
+                for index, item in enumerate(parent.value):
+                    wanted = segment == ANY_INDEX or segment == index
+                    if wanted and item.start_mark.index < previous:
+                        raise _NeedsRoundTrip('alias')
+                    if wanted:
+                        found.append(item)
+                    previous = max(previous, item.end_mark.index)
+        nodes = found
+    return nodes
+
+
+def _value_start(text, node):
+    # Return the offset of node's value text, after its anchor and tag, and
+    # whether a tag was written there.
+    start = node.start_mark.index
+    properties = _PROPERTIES.match(text, start, node.end_mark.index).group()
+    return start + len(properties), '!' in properties
+
+
+def _check_tag(replacement, node):
+    # A value written after an explicit standard tag must be one that tag can
+    # hold: "!!int hello" does not load. Local tags (!foo) are not checked.
+    if not node.tag.startswith(_STANDARD_TAG):
+        return
+    try:
+        get_loader('pyyaml').load(f"!<{node.tag}> {replacement}")
+    except Exception:
+        raise EditError(f"{replacement} is not a valid !!{node.tag[len(_STANDARD_TAG):]} "
+                        f"(line {node.start_mark.line + 1})") from None
+
+
+def _format(value, node, start, json_file):
+    # libyaml reports plain scalars with style '', the Python parser with None.
+    plain = not node.style
+    if node.style in ('|', '>') or node.start_mark.line != node.end_mark.line:
+        raise _NeedsRoundTrip('multi-line scalar')
+    if start == node.end_mark.index:
+        # An empty value has no text to replace, and "key:" + "5" is no mapping.
+        raise _NeedsRoundTrip('empty scalar')
+    if json_file:
+        if plain:
+            try:
+                if not isinstance(json.loads(value), (str, list, dict)):
+                    return value
+            except ValueError:
+                pass
+        return json.dumps(value, ensure_ascii=False)
+    if node.style == "'" and '\n' not in value:
+        return "'" + value.replace("'", "''") + "'"
+    if plain and _PLAIN.match(value):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def patch_text(text, assignments, json_file=False):
+    """Return (new text, changes, mode) after applying [(segments, value)] to every document.
+
+    mode is IN_PLACE when only the old values' bytes were replaced and
+    ROUND_TRIP when the file had to be loaded and dumped again. Raises
+    NoMatchError when no path leads to a value.
+    """
+    from yaml.nodes import ScalarNode
+
+    # The composer skips a byte order mark without counting it in its marks.
+    if text.startswith('\ufeff'):
+        new_text, changes, mode = patch_text(text[1:], assignments, json_file)
+        return '\ufeff' + new_text, changes, mode
+    try:
+        spans = []
+        for document in get_loader('pyyaml').compose_all(text):
+            if document is None:
+                continue
+            for segments, value in assignments:
+                for node in _follow(document, segments):
+                    if not isinstance(node, ScalarNode):
+                        raise EditError(f"the value at line {node.start_mark.line + 1} is not a scalar")
+                    start, tagged = _value_start(text, node)
+                    replacement = _format(value, node, start, json_file)
+                    if tagged:
+                        _check_tag(replacement, node)
+                    spans.append((start, node.end_mark.index, replacement))
+    except _NeedsRoundTrip:
+        return _round_trip(text, assignments, json_file)
+    if not spans:
+        raise NoMatchError('no value at ' + _paths(assignments))
+    spans.sort()
+    for (_, end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < end:
+            raise EditError('two assignments set the same value')
+    parts = []
+    position = 0
+    changes = 0
+    for start, end, replacement in spans:
+        parts.append(text[position:start])
+        parts.append(replacement)
+        changes += text[start:end] != replacement
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts), changes, IN_PLACE
+
+
+def _set_all(data, segments, value):
+    # Set value wherever segments lead in loaded data; return (found, changed).
+    containers = [data]
+    for segment in segments[:-1]:
+        found = []
+        for container in containers:
+            found.extend(_step(container, segment))
+        containers = found
+    found = changes = 0
+    last = segments[-1]
+    for container in containers:
+        if isinstance(container, dict):
+            keys = [key for key in container if last == ANY_KEY or str(key) == str(last)]
+        elif isinstance(container, list):
+            keys = (range(len(container)) if last == ANY_INDEX
+                    else [last] if isinstance(last, int) and last < len(container) else [])
+        else:
+            keys = []
+        for key in keys:
+            found += 1
+            if isinstance(container[key], (dict, list)):
+                raise EditError(f"{key!r} is not a scalar")
+            if container[key] != value or type(container[key]) is not type(value):
+                container[key] = value
+                changes += 1
+    return found, changes
+
+
+def _step(container, segment):
+    if isinstance(container, dict):
+        return [value for key, value in container.items() if segment == ANY_KEY or str(key) == str(segment)]
+    if isinstance(container, list):
+        if segment == ANY_INDEX:
+            return list(container)
+        if isinstance(segment, int) and segment < len(container):
+            return [container[segment]]
+    return []
+
+
+def _set_in(documents, assignments, json_file):
+    # Apply assignments to loaded documents; return the number of values changed.
+    found = changes = 0
+    for data in documents:
+        for segments, value in assignments:
+            matched, changed = _set_all(data, segments, _typed(value, json_file))
+            found += matched
+            changes += changed
+    if not found:
+        raise NoMatchError('no value at ' + _paths(assignments))
+    return changes
+
+
+def _round_trip(text, assignments, json_file):
+    if json_file:
+        data = json.loads(text)
+        changes = _set_in([data], assignments, json_file)
+        return json.dumps(data, indent=2, ensure_ascii=False) + '\n', changes, ROUND_TRIP
+    try:
+        from ruamel.yaml import YAML
+    except ImportError:
+        raise EditError('this value can only be set by a round trip, which needs ruamel.yaml') from None
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    documents = list(yaml.load_all(text))
+    changes = _set_in(documents, assignments, json_file)
+    out = io.StringIO()
+    yaml.dump_all(documents, out)
+    return out.getvalue(), changes, ROUND_TRIP
+
+
+def _typed(value, json_file):
+    if json_file:
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    from yaml_tools.resolve import resolve_scalar
+
+    return resolve_scalar(value)
+
+
+def patch_file(path, assignments, dry_run=False):
+    """Apply assignments to the file at path; return (changes, mode).
+
+    The file is replaced atomically, and only when something changed.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        text = file.read()
+    new_text, changes, mode = patch_text(text, assignments, path.endswith('.json'))
+    if changes and not dry_run:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as file:
+                file.write(new_text)
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return changes, mode
+
+
+def main(argv=None):
+    from yaml_tools.cli import iter_files
+
+    parser = argparse.ArgumentParser(description='Set values in YAML/JSON files, keeping comments and layout.')
+    parser.add_argument('targets', nargs='+', help='files, directories or globs (quote them)')
+    parser.add_argument('--set', dest='assignments', action='append', required=True, metavar='PATH=VALUE',
+                        help='value to set; PATH may use * and [*] (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    args = parser.parse_args(argv)
+    try:
+        assignments = [parse_assignment(text) for text in args.assignments]
+    except EditError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    files = changed = failed = round_trips = unmatched = 0
+    for path in iter_files(args.targets, ('.yml', '.yaml', '.json')):
+        files += 1
+        try:
+            changes, mode = patch_file(path, assignments, args.dry_run)
+        except NoMatchError:
+            # Normal for some files of a directory; an error only if it is all of them.
+            unmatched += 1
+            continue
+        except Exception as exc:
+            failed += 1
+            print(f"{path}: {type(exc).__name__}: {exc}".splitlines()[0])
+            continue
+        if changes:
+            changed += 1
+            round_trips += mode == ROUND_TRIP
+            print(f"{path}: {changes} values set ({mode})")
+    wall = time.perf_counter() - start
+    print(f"# {files} files, {changed} changed ({round_trips} by round trip), {failed} errors in {wall:.2f} s"
+          + (' (dry run)' if args.dry_run else ''), file=sys.stderr)
+    if files and unmatched == files:
+        print(f"no value at {_paths(assignments)} in any file", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# yaml_tools/events.py
+# Flattens YAML straight from the parser's event stream.
+#
+# read_yaml + display_as_table builds the whole document in memory before the
+# first row comes out. The functions here drive yaml.parse / ruamel's
+# YAML.parse instead and turn events into the same
+# (path, value, key_type, value_type) rows as they arrive, so memory stays
+# bounded by nesting depth and anchored content rather than document size.
+#
+# Only the parts that need the whole node to get the right value are built as
+# small node trees and handed to the library's constructor:
+#   - mappings that use the merge key "<<"
+#   - collections with an explicit tag such as !!set or !!omap
+#   - complex (sequence or mapping) keys
+
+import sys
+
+from yaml_tools.flatten import DEFAULT_MAX_ALIAS_ROWS, AliasExpansionError, iter_rows
+from yaml_tools.loaders import get_loader, new_ruamel_yaml
+
+MAP_TAG = 'tag:yaml.org,2002:map'
+SEQ_TAG = 'tag:yaml.org,2002:seq'
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+
+_MAP, _SEQ = 'map', 'seq'
+_NO_KEY = object()
+
+
+class _PyYAMLBackend:
+    name = 'pyyaml'
+
+    def __init__(self):
+        import yaml
+        from yaml import nodes
+
+        loader = get_loader('pyyaml')
+        self.parse = loader.parse
+        self.resolver = self.constructor = loader.Loader('')
+        self.ScalarNode = nodes.ScalarNode
+        self.SequenceNode = nodes.SequenceNode
+        self.MappingNode = nodes.MappingNode
+        self.ComposerError = yaml.composer.ComposerError
+
+    @staticmethod
+    def event_tag(event):
+        return event.tag
+
+
+class _RuamelBackend:
+    name = 'ruamel'
+
+    def __init__(self):
+        from ruamel.yaml import nodes, composer
+
+        # A private instance: the shared loader may be busy with another file.
+        self._yaml = new_ruamel_yaml()
+        self.resolver = self._yaml.resolver
+        self.constructor = self._yaml.constructor
+        self.ScalarNode = nodes.ScalarNode
+        self.SequenceNode = nodes.SequenceNode
+        self.MappingNode = nodes.MappingNode
+        self.ComposerError = composer.ComposerError
+
+    def parse(self, stream):
+        return self._yaml.parse(stream)
+
+    @staticmethod
+    def event_tag(event):
+        return event.ctag
+
+
+_BACKENDS = {'pyyaml': _PyYAMLBackend, 'ruamel': _RuamelBackend}
+
+
+def _replay(items):
+    # Recorded anchors hold events plus nested lists for aliases inside them.
+    stack = [iter(items)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, list):
+                stack.append(iter(item))
+                break
+            yield item
+        else:
+            stack.pop()
+
+
+def _expand_aliases(events, backend, max_alias_events=DEFAULT_MAX_ALIAS_ROWS):
+    """Replace every AliasEvent with a replay of the events of its anchor."""
+    anchors = {}
+    replayed = 0
+    recording = []  # [anchor, items, depth] for every anchored node still open
+    for event in events:
+        kind = type(event).__name__
+        if kind == 'AliasEvent':
+            if event.anchor not in anchors:
+                raise backend.ComposerError(None, None, f"found undefined alias {event.anchor!r}",
+                                            event.start_mark)
+            items = anchors[event.anchor]
+            for record in recording:
+                record[1].append(items)
+            for item in _replay(items):
+                replayed += 1
+                if replayed > max_alias_events:
+                    raise AliasExpansionError(
+                        f"aliases expand to more than {max_alias_events} events (at *{event.anchor})")
+                yield item
+            continue
+        if kind == 'DocumentStartEvent':
+            anchors.clear()
+        for record in recording:
+            record[1].append(event)
+        if kind in ('MappingStartEvent', 'SequenceStartEvent'):
+            for record in recording:
+                record[2] += 1
+            if event.anchor is not None:
+                recording.append([event.anchor, [event], 1])
+        elif kind in ('MappingEndEvent', 'SequenceEndEvent'):
+            for record in recording:
+                record[2] -= 1
+            while recording and recording[-1][2] == 0:
+                anchor, items, _ = recording.pop()
+                anchors[anchor] = items
+        elif kind == 'ScalarEvent' and event.anchor is not None:
+            anchors[event.anchor] = [event]
+        yield event
+
+
+class _EventFlattener:
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def resolve(self, event, node_class, value):
+        tag = self.backend.event_tag(event)
+        if tag is None or str(tag) == '!':
+            tag = self.backend.resolver.resolve(node_class, value, event.implicit)
+        return tag
+
+    def construct(self, node):
+        constructor = self.backend.constructor
+        try:
+            return constructor.construct_object(node, deep=True)
+        finally:
+            constructor.constructed_objects.clear()
+
+    def scalar_node(self, event):
+        tag = self.resolve(event, self.backend.ScalarNode, event.value)
+        return self.backend.ScalarNode(tag, event.value, event.start_mark, event.end_mark,
+                                       style=event.style)
+
+    def compose(self, event, events, stack=None):
+        """Build the node that starts with event, reading the rest from events.
+
+        With a stack of already open [node, pending_key] entries, keep reading
+        until the outermost of them is closed and return it instead.
+        """
+        backend = self.backend
+        stack = stack if stack is not None else []
+        while True:
+            kind = type(event).__name__
+            if kind == 'ScalarEvent':
+                node = self.scalar_node(event)
+            elif kind == 'SequenceStartEvent':
+                tag = self.resolve(event, backend.SequenceNode, None)
+                stack.append([backend.SequenceNode(tag, [], event.start_mark, None,
+                                                   flow_style=event.flow_style), _NO_KEY])
+                event = next(events)
+                continue
+            elif kind == 'MappingStartEvent':
+                tag = self.resolve(event, backend.MappingNode, None)
+                stack.append([backend.MappingNode(tag, [], event.start_mark, None,
+                                                  flow_style=event.flow_style), _NO_KEY])
+                event = next(events)
+                continue
+            else:
+                node = stack.pop()[0]
+                node.end_mark = event.end_mark
+            if not stack:
+                return node
+            parent = stack[-1]
+            if isinstance(parent[0], backend.SequenceNode):
+                parent[0].value.append(node)
+            elif parent[1] is _NO_KEY:
+                parent[1] = node
+            else:
+                parent[0].value.append((parent[1], node))
+                parent[1] = _NO_KEY
+            event = next(events)
+
+    def complex_key(self, event, events):
+        # Let the library decide how a collection key is hashed (or rejected)
+        # by constructing a one-entry mapping around it.
+        backend = self.backend
+        key_node = self.compose(event, events)
+        null_node = backend.ScalarNode(backend.resolver.resolve(backend.ScalarNode, '', (True, False)), '')
+        wrapper = backend.MappingNode(backend.resolver.resolve(backend.MappingNode, None, True),
+                                      [(key_node, null_node)], key_node.start_mark, key_node.end_mark)
+        return next(iter(self.construct(wrapper)))
+
+    def rows(self, events):
+        """Yield (document_index, row) pairs for every scalar in the stream."""
+        backend = self.backend
+        events = _expand_aliases(events, backend)
+        document = -1
+        frames = []
+        for event in events:
+            kind = type(event).__name__
+            if kind == 'DocumentStartEvent':
+                document += 1
+                frames = []
+                continue
+            if kind in ('MappingEndEvent', 'SequenceEndEvent'):
+                frames.pop()
+                continue
+            if kind not in ('ScalarEvent', 'MappingStartEvent', 'SequenceStartEvent'):
+                continue
+
+            # Work out where this node sits in the document.
+            if not frames:
+                path = ''
+            else:
+                frame = frames[-1]
+                if frame[0] is _SEQ:
+                    path = f"{frame[1]}[{frame[2]}]"
+                    frame[2] += 1
+                elif frame[2] is _NO_KEY:
+                    if kind == 'ScalarEvent':
+                        node = self.scalar_node(event)
+                        if str(node.tag) == MERGE_TAG:
+                            yield from self.merged_rows(document, frames.pop(), node, events)
+                            continue
+                        key = self.construct(node)
+                    else:
+                        key = self.complex_key(event, events)
+                    frame[2] = key
+                    frame[3].add(key)
+                    continue
+                else:
+                    key, frame[2] = frame[2], _NO_KEY
+                    path = f"{frame[1]}.{key}" if frame[1] else key
+
+            if kind == 'ScalarEvent':
+                value = self.construct(self.scalar_node(event))
+                yield document, (path, value, type(path).__name__, type(value).__name__)
+            elif kind == 'MappingStartEvent':
+                tag = str(self.resolve(event, backend.MappingNode, None))
+                if tag == MAP_TAG:
+                    frames.append([_MAP, path, _NO_KEY, set()])
+                else:
+                    for row in iter_rows(self.construct(self.compose(event, events)), path):
+                        yield document, row
+            else:
+                tag = str(self.resolve(event, backend.SequenceNode, None))
+                if tag == SEQ_TAG:
+                    frames.append([_SEQ, path, 0])
+                else:
+                    for row in iter_rows(self.construct(self.compose(event, events)), path):
+                        yield document, row
+
+    def merged_rows(self, document, frame, merge_key, events):
+        # Build the rest of this mapping, "<<" included, and let the library
+        # apply its merge rules. Keys already streamed out keep their value.
+        backend = self.backend
+        mapping = backend.MappingNode(backend.resolver.resolve(backend.MappingNode, None, True), [],
+                                      merge_key.start_mark, None)
+        mapping = self.compose(next(events), events, [[mapping, merge_key]])
+        value = self.construct(mapping)
+        seen = frame[3]
+        remaining = {key: item for key, item in value.items() if key not in seen}
+        for row in iter_rows(remaining, frame[1]):
+            yield document, row
+
+
+def _backend(backend):
+    if backend not in _BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {sorted(_BACKENDS)}")
+    return _BACKENDS[backend]()
+
+
+def iter_event_documents(stream, backend='pyyaml'):
+    """Yield (document_index, row) for every scalar of every document in stream."""
+    flattener = _EventFlattener(_backend(backend))
+    return flattener.rows(flattener.backend.parse(stream))
+
+
+def iter_event_rows(stream, backend='pyyaml'):
+    """Yield flattened rows for every document in stream without loading it."""
+    for _, row in iter_event_documents(stream, backend):
+        yield row
+
+
+def main(file_path, backend='pyyaml'):
+    current = None
+    with open(file_path, 'r') as file:
+        for document, (key, value, key_type, value_type) in iter_event_documents(file, backend):
+            if document != current:
+                current = document
+                print(f"\nDocument {document + 1}")
+            print(f"{key}\t{value}\t{key_type}\t{value_type}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python -m yaml_tools.events FILE [pyyaml|ruamel]")
+    main(*sys.argv[1:])
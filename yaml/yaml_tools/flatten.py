@@ -0,0 +1,183 @@
+# yaml_tools/flatten.py
+# Turns a parsed YAML document into flat (path, value, key_type, value_type) rows.
+#
+# The walk uses an explicit stack of child iterators instead of recursion, so
+# deeply nested documents do not hit the recursion limit and rows are yielded
+# one at a time instead of being copied into a new list at every level.
+# Path strings are not built level by level either: a container's path is
+# spelled once, with one join, when the first scalar inside it needs it.
+#
+# Anchors and aliases (&name / *name, <<: *name) load as one Python object
+# shared by every alias site. Such shared subtrees are flattened once into
+# rows with paths relative to the subtree; every further occurrence only
+# re-prefixes those rows. Aliases that expand into more than max_alias_rows
+# rows ("billion laughs") or refer back to their own ancestors raise
+# AliasExpansionError.
+
+from yaml_tools.paths import _spell
+
+DEFAULT_MAX_ALIAS_ROWS = 1_000_000
+
+
+class AliasExpansionError(ValueError):
+    """Raised for recursive aliases or aliases that expand too far."""
+
+
+def _mapping_children(mapping, parent_key):
+    for key, value in mapping.items():
+        yield (f"{parent_key}.{key}" if parent_key else key), value
+
+
+def _sequence_children(sequence, parent_key):
+    for index, item in enumerate(sequence):
+        yield f"{parent_key}[{index}]", item
+
+
+def _children(value, key):
+    if isinstance(value, dict):
+        return _mapping_children(value, key)
+    return _sequence_children(value, key)
+
+
+def _items(value):
+    return iter(value.items()) if isinstance(value, dict) else enumerate(value)
+
+
+def _shared_containers(data):
+    """Return the ids of dicts and lists reachable through more than one path."""
+    seen = {id(data)}
+    shared = set()
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        for value in (node.values() if isinstance(node, dict) else node):
+            if isinstance(value, (dict, list)):
+                value_id = id(value)
+                if value_id in seen:
+                    shared.add(value_id)
+                else:
+                    seen.add(value_id)
+                    stack.append(value)
+    return shared
+
+
+def _replay(record, prefix):
+    # A record holds (suffix, value, value_type) rows and (suffix, record)
+    # references to the records of shared subtrees nested inside it.
+    stack = [(iter(record), prefix)]
+    while stack:
+        entries, base = stack[-1]
+        for entry in entries:
+            if len(entry) == 2:
+                stack.append((iter(entry[1]), base + entry[0]))
+                break
+            yield base + entry[0], entry[1], 'str', entry[2]
+        else:
+            stack.pop()
+
+
+def _prefix(stack):
+    # Path of the container on top of the stack, spelled from the nearest
+    # ancestor whose path is known. A frame is [children, is_list, path,
+    # link], link being (is_key, segment) under its parent.
+    index = len(stack) - 1
+    while stack[index][2] is None:
+        index -= 1
+    path = stack[-1][2] = _spell([frame[3] for frame in stack[index + 1:]], stack[index][2])
+    return path
+
+
+def _iter_plain_rows(data, parent_key):
+    if not isinstance(data, (dict, list)):
+        yield parent_key, data, type(parent_key).__name__, type(data).__name__
+        return
+    # The stack is the chain of parents. A frame only gets its path string
+    # once a scalar directly inside it needs one, so a deep chain of
+    # containers is spelled out once instead of once per level.
+    stack = [[_items(data), isinstance(data, list), parent_key, None]]
+    while stack:
+        frame = stack[-1]
+        for segment, value in frame[0]:
+            if isinstance(value, (dict, list)):
+                stack.append([_items(value), isinstance(value, list), None, (not frame[1], segment)])
+                break
+            path = frame[2]
+            if path is None:
+                path = _prefix(stack)
+            if frame[1]:
+                key = f"{path}[{segment}]"
+            else:
+                key = f"{path}.{segment}" if path else segment
+            yield key, value, type(key).__name__, type(value).__name__
+        else:
+            stack.pop()
+
+
+def _iter_shared_rows(data, parent_key, shared, max_alias_rows):
+    records = {}        # id -> finished record of a shared subtree
+    active = set()      # ids of shared subtrees currently being walked
+    recording = []      # [record, len(prefix)] for shared subtrees being walked
+    alias_rows = 0
+    # Each frame: [children, id of a shared container or None, records it]
+    stack = [[iter(((parent_key, data),)), None, False]]
+    while stack:
+        frame = stack[-1]
+        for key, value in frame[0]:
+            if not isinstance(value, (dict, list)):
+                if recording:
+                    record, base = recording[-1]
+                    record.append((key[base:], value, type(value).__name__))
+                yield key, value, type(key).__name__, type(value).__name__
+                continue
+            node_id = id(value)
+            if node_id not in shared:
+                stack.append([_children(value, key), None, False])
+                break
+            if node_id in active:
+                raise AliasExpansionError(f"recursive alias at {key!r}")
+            prefix = f"{key}" if key else ''
+            if node_id in records and prefix:
+                record = records[node_id]
+                if recording:
+                    recording[-1][0].append((prefix[recording[-1][1]:], record))
+                for row in _replay(record, prefix):
+                    alias_rows += 1
+                    if max_alias_rows is not None and alias_rows > max_alias_rows:
+                        raise AliasExpansionError(
+                            f"aliases expand to more than {max_alias_rows} rows (at {key!r})")
+                    yield row
+                continue
+            active.add(node_id)
+            records_it = bool(prefix) and node_id not in records
+            if records_it:
+                record = []
+                if recording:
+                    recording[-1][0].append((prefix[recording[-1][1]:], record))
+                recording.append([record, len(prefix)])
+            stack.append([_children(value, key), node_id, records_it])
+            break
+        else:
+            stack.pop()
+            if frame[1] is not None:
+                active.discard(frame[1])
+                if frame[2]:
+                    records[frame[1]] = recording.pop()[0]
+
+
+def iter_rows(data, parent_key='', max_alias_rows=DEFAULT_MAX_ALIAS_ROWS):
+    """Yield a (path, value, key_type, value_type) row for every scalar in data.
+
+    Subtrees shared through YAML aliases are walked once and replayed at
+    every other occurrence. Pass max_alias_rows=None to lift the expansion
+    limit.
+    """
+    if isinstance(data, (dict, list)):
+        shared = _shared_containers(data)
+        if shared:
+            return _iter_shared_rows(data, parent_key, shared, max_alias_rows)
+    return _iter_plain_rows(data, parent_key)
+
+
+def display_as_table(data, parent_key=''):
+    """Return all rows of data as a list, for callers that need a list."""
+    return list(iter_rows(data, parent_key))
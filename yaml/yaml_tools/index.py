@@ -0,0 +1,162 @@
+# yaml_tools/index.py
+# A path index over flattened rows, for asking many questions of one file.
+#
+# Rows are stored in a trie keyed by path segment: mapping keys are str
+# segments and list positions are int segments, so
+# "spec.containers[0].image" is ('spec', 'containers', 0, 'image').
+#
+# Queries use the same syntax as the paths, plus wildcards:
+#   spec.replicas                 exact path
+#   spec.template.*               everything below spec.template
+#   spec.containers[*].image      any list position
+#   metadata.*.app                any single mapping key
+#   **.image                      any number of segments
+#
+# A literal segment is one dict lookup, so a query only visits the parts of
+# the trie it can match instead of scanning every row.
+#
+# Keys that themselves contain "." or "[n]" cannot be told apart from nested
+# paths once flattened; they are indexed as if they were nested.
+
+import re
+import sys
+
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+
+ANY_KEY = '*'
+ANY_INDEX = '[*]'
+ANY_DEPTH = '**'
+
+_SEGMENT = re.compile(r'\[(\d+|\*)\]|\.?([^.\[]+)')
+
+
+def parse_path(path):
+    """Split a flattened path or a query into a tuple of segments."""
+    segments = []
+    for index, key in _SEGMENT.findall(str(path)):
+        if index == '*':
+            segments.append(ANY_INDEX)
+        elif index:
+            segments.append(int(index))
+        else:
+            segments.append(key)
+    return tuple(segments)
+
+
+class _Node:
+    __slots__ = ('children', 'rows')
+
+    def __init__(self):
+        self.children = {}
+        self.rows = []
+
+
+class PathIndex:
+    """Trie of flattened rows supporting exact, prefix and wildcard lookups."""
+
+    def __init__(self, rows=()):
+        self._root = _Node()
+        self.size = 0
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(iter_rows(data))
+
+    def add(self, row):
+        node = self._root
+        for segment in parse_path(row[0]):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        node.rows.append(row)
+        self.size += 1
+
+    def get(self, path):
+        """Return the rows stored at exactly this path."""
+        node = self._root
+        for segment in parse_path(path):
+            node = node.children.get(segment)
+            if node is None:
+                return []
+        return list(node.rows)
+
+    def query(self, pattern):
+        """Yield the rows matching a pattern; a trailing ".*" matches everything below."""
+        segments = parse_path(pattern)
+        below = False
+        if segments and segments[-1] == ANY_KEY and str(pattern).endswith('.*'):
+            segments, below = segments[:-1], True
+        for node in self._match(segments):
+            if below:
+                yield from self._subtree(node)
+            else:
+                yield from node.rows
+
+    def prefix(self, path):
+        """Yield every row at or below path."""
+        for node in self._match(parse_path(path)):
+            yield from self._subtree(node)
+
+    def _match(self, segments):
+        nodes = [self._root]
+        for segment in segments:
+            matched = []
+            # Several routes can lead to one node ("**.**.x"); keep it once.
+            seen = set()
+            for node in nodes:
+                if segment == ANY_DEPTH:
+                    # A node seen already came with all of its descendants.
+                    matched.extend(self._descendants(node, seen))
+                    continue
+                if segment == ANY_KEY:
+                    children = [child for key, child in node.children.items() if isinstance(key, str)]
+                elif segment == ANY_INDEX:
+                    children = [child for key, child in node.children.items() if isinstance(key, int)]
+                else:
+                    child = node.children.get(segment)
+                    children = [] if child is None else [child]
+                for child in children:
+                    if id(child) not in seen:
+                        seen.add(id(child))
+                        matched.append(child)
+            if not matched:
+                return []
+            nodes = matched
+        return nodes
+
+    @staticmethod
+    def _descendants(node, seen=None):
+        # Yield node and everything below it, skipping subtrees whose top is in seen.
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if seen is not None:
+                if id(node) in seen:
+                    continue
+                seen.add(id(node))
+            yield node
+            stack.extend(reversed(list(node.children.values())))
+
+    def _subtree(self, node):
+        for descendant in self._descendants(node):
+            yield from descendant.rows
+
+
+def main(file_path, *patterns, backend='pyyaml'):
+    with open(file_path, 'r') as file:
+        documents = list(get_loader(backend).load_all(file))
+    index = PathIndex(row for document in documents for row in iter_rows(document))
+    for pattern in patterns:
+        print(f"# {pattern}")
+        for key, value, key_type, value_type in index.query(pattern):
+            print(f"{key}\t{value}\t{key_type}\t{value_type}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m yaml_tools.index FILE QUERY [QUERY ...]")
+    main(*sys.argv[1:])
@@ -0,0 +1,114 @@
+# yaml_tools/loaders.py
+# One parser per backend per process, using the libyaml C implementation
+# whenever it is installed.
+#
+# PyYAML ships CSafeLoader only when it was built against libyaml, and
+# ruamel.yaml only uses CParser when ruamel.yaml.clib is installed. Both fall
+# back to their pure-Python parsers otherwise; get_loader records which one it
+# picked in `implementation` and the reason for a fallback in `fallback`, and
+# warns (RuntimeWarning, on stderr by default) when it had to fall back.
+
+from functools import lru_cache
+
+BACKENDS = ('pyyaml', 'ruamel')
+
+
+class PyYAMLLoader:
+    name = 'pyyaml'
+
+    def __init__(self, prefer_c=True, typing='implicit'):
+        import yaml
+
+        from yaml_tools.resolve import loader_class
+
+        self._yaml = yaml
+        base = yaml.SafeLoader
+        self.fallback = None
+        if not prefer_c:
+            self.fallback = 'C loader disabled'
+        elif getattr(yaml, 'CSafeLoader', None) is None:
+            self.fallback = 'PyYAML was built without libyaml'
+        else:
+            base = yaml.CSafeLoader
+        self.implementation = base.__name__
+        # Same data as base, with cached scalar resolution (yaml_tools.resolve).
+        self.Loader = loader_class(base, typing)
+
+    def load(self, stream):
+        return self._yaml.load(stream, Loader=self.Loader)
+
+    def load_all(self, stream):
+        return self._yaml.load_all(stream, Loader=self.Loader)
+
+    def parse(self, stream):
+        return self._yaml.parse(stream, Loader=self.Loader)
+
+    def compose_all(self, stream):
+        return self._yaml.compose_all(stream, Loader=self.Loader)
+
+
+def new_ruamel_yaml(prefer_c=True):
+    """Return a YAML(typ='safe') instance set up the way the lesson scripts use it."""
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ='safe', pure=not prefer_c)
+    yaml.version = (1, 2)
+    return yaml
+
+
+class RuamelLoader:
+    name = 'ruamel'
+
+    def __init__(self, prefer_c=True, typing='implicit'):
+        if typing != 'implicit':
+            raise ValueError(f"typing={typing!r} needs the pyyaml backend")
+        # A YAML instance keeps per-load state, so it must not be shared
+        # between threads or used by two loads that interleave.
+        self._yaml = new_ruamel_yaml(prefer_c)
+        self.fallback = None
+        self.implementation = self._yaml.Parser.__name__
+        if not prefer_c:
+            self.fallback = 'C parser disabled'
+        elif self.implementation != 'CParser':
+            self.fallback = 'ruamel.yaml.clib is not installed'
+
+    def load(self, stream):
+        return self._yaml.load(stream)
+
+    def load_all(self, stream):
+        return self._yaml.load_all(stream)
+
+    def parse(self, stream):
+        return self._yaml.parse(stream)
+
+    def compose_all(self, stream):
+        return self._yaml.compose_all(stream)
+
+
+_LOADERS = {'pyyaml': PyYAMLLoader, 'ruamel': RuamelLoader}
+
+
+@lru_cache(maxsize=None)
+def get_loader(backend='pyyaml', prefer_c=True, typing='implicit'):
+    """Return the process-wide loader for backend, building it on first use.
+
+    typing='strings' keeps plain scalars as str and typing='lazy' types them
+    on access (see yaml_tools.resolve); both need the pyyaml backend.
+    """
+    if backend not in _LOADERS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {list(BACKENDS)}")
+    loader = _LOADERS[backend](prefer_c, typing)
+    if loader.fallback and prefer_c:
+        # A warning, not a log record: none of the CLIs configure logging, and
+        # a parser several times slower should not go unnoticed. get_loader is
+        # cached, so this is said once per loader.
+        import warnings
+
+        warnings.warn(f"{backend}: using the pure-Python {loader.implementation} ({loader.fallback}); "
+                      f"loading will be several times slower", RuntimeWarning, stacklevel=2)
+    return loader
+
+
+def describe(loader):
+    """Return a short label such as 'pyyaml/CSafeLoader' for reports."""
+    return f"{loader.name}/{loader.implementation}"
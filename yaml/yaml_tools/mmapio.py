@@ -0,0 +1,145 @@
+# yaml_tools/mmapio.py
+# Finds documents and top-level keys in a YAML file by scanning its bytes.
+#
+# Opening a file in text mode decodes all of it into one str before anything
+# looks at it. Here the file is memory-mapped instead and the regexes run over
+# the mapping: document markers ("---", "..."), directives and top-level key
+# lines are found without a decoded copy, and each document is handed to the
+# parser as a bytes slice of its own. Pages already scanned can be dropped
+# again (iter_documents(release=True)), so peak memory is about the size of
+# the largest document, not of the file.
+#
+# The same scanners work on plain bytes, for text that is already in memory.
+# Documents are cut by the same rules as multidoc.split_documents.
+
+import mmap
+import re
+from contextlib import contextmanager
+
+_BOM = b'\xef\xbb\xbf'
+_MARKER = re.compile(rb'^(---|\.\.\.)(?=[ \t\r\n]|\Z)', re.MULTILINE)
+_DIRECTIVE = re.compile(rb'^%', re.MULTILINE)
+# Anything but blank lines and comments; outside an explicit document a
+# "%" at column 0 starts a directive, not content.
+_CONTENT = re.compile(rb'^[ \t]*[^\s#]', re.MULTILINE)
+_BARE_CONTENT = re.compile(rb'^(?:[ \t]+[^\s#]|[^\s#%])', re.MULTILINE)
+_SECTION_CONTENT = re.compile(rb'^(?!---)[ \t]*[^\s#]', re.MULTILINE)
+_KEY_LINE = re.compile(rb'^[^ \t\r\n#-]', re.MULTILINE)
+_NEWLINE = re.compile(rb'\n')
+_KEY = re.compile(rb'("[^"\n]*"|\'[^\'\n]*\'|[^\s#"\'][^\n]*?)[ \t]*:(?=[ \t\r\n]|\Z)')
+
+
+@contextmanager
+def mapped(file_path):
+    """Map file_path read-only; an empty file gives b'' (mmap rejects length 0)."""
+    with open(file_path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def _line_end(view, position):
+    match = _NEWLINE.search(view, position)
+    return match.end() if match else len(view)
+
+
+def _document_spans(view):
+    # Offsets are relative to view, whose start is a line start. Lazy, so a
+    # memory map is read front to back as the spans are consumed.
+    document = position = 0
+    explicit = False  # the current document was opened with "---"
+    for match in _MARKER.finditer(view):
+        marker = match.start()
+        content = (_CONTENT if explicit else _BARE_CONTENT).search(view, position, marker) is not None
+        if explicit or content:
+            yield document, marker
+            document = marker
+        if match.group(1) == b'---':
+            if not explicit and not content:
+                # Directives right before "---" belong to the document it opens.
+                directive = _DIRECTIVE.search(view, position, marker)
+                document = directive.start() if directive else marker
+            explicit = True
+        else:
+            explicit = False
+            document = _line_end(view, marker)
+        position = _line_end(view, marker)
+    if explicit or _BARE_CONTENT.search(view, position):
+        yield document, len(view)
+
+
+def _skip_bom(buffer, start):
+    return start + 3 if buffer[start:start + 3] == _BOM else start
+
+
+def document_spans(buffer, start=0, end=None):
+    """Return the (start, end) byte offsets of every document in buffer."""
+    end = len(buffer) if end is None else end
+    start = _skip_bom(buffer, start)
+    # A view starting at `start` lets "^" match there; it copies nothing.
+    with memoryview(buffer) as whole, whole[start:end] as view:
+        return [(start + first, start + last) for first, last in _document_spans(view)]
+
+
+def _section_starts(view):
+    first = _SECTION_CONTENT.search(view)
+    if first is None:
+        return []
+    return [first.start()] + [match.start() for match in _KEY_LINE.finditer(view, _line_end(view, first.start()))]
+
+
+def section_spans(buffer, start, end):
+    """Split one document into (start, end) spans, one per top-level key.
+
+    Comments and blank lines before the first key stay with the first
+    section. A document without top-level keys is one section.
+    """
+    with memoryview(buffer) as whole, whole[start:end] as view:
+        cuts = [start + cut for cut in _section_starts(view)[1:]]
+    bounds = [start] + cuts + [end]
+    return list(zip(bounds, bounds[1:]))
+
+
+def top_level_keys(buffer, start, end):
+    """Return (key, offset) for the top-level keys of a document, key as raw bytes."""
+    keys = []
+    with memoryview(buffer) as whole, whole[start:end] as view:
+        for line in _section_starts(view):
+            key = _KEY.match(view, line, _line_end(view, line))
+            if key:
+                keys.append((bytes(key.group(1)), start + line))
+    return keys
+
+
+def iter_documents(buffer, release=False):
+    """Yield the bytes of every document in buffer, one slice at a time.
+
+    With release=True and a memory map, the pages before the current
+    document are dropped from memory as the scan moves on, so resident
+    memory stays around one document however large the file is. Close the
+    generator before closing the map.
+    """
+    start = _skip_bom(buffer, 0)
+    release = release and isinstance(buffer, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED')
+    released = 0
+    whole = memoryview(buffer)
+    view = whole[start:]
+    spans = _document_spans(view)
+    try:
+        for first, last in spans:
+            yield buffer[start + first:start + last]
+            if release:
+                boundary = (start + last) // mmap.PAGESIZE * mmap.PAGESIZE
+                if boundary > released:
+                    buffer.madvise(mmap.MADV_DONTNEED, released, boundary - released)
+                    released = boundary
+    finally:
+        spans.close()
+        view.release()
+        whole.release()
@@ -0,0 +1,116 @@
+# yaml_tools/multidoc.py
+# Splits a multi-document YAML stream on its "---" / "..." markers and
+# flattens the documents in a process pool.
+#
+# Document markers at the start of a line can never be part of a scalar, so
+# the stream can be cut into documents by looking at lines alone, without
+# parsing it. Each worker then parses and flattens whole documents, and the
+# results come back in the same order as the documents in the file.
+#
+# iter_flattened_file does the same cut on a memory map of the file
+# (yaml_tools.mmapio), so only the documents in flight are ever in memory.
+
+import os
+from collections import deque
+
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.mmapio import iter_documents, mapped
+
+
+def _is_marker(line, marker):
+    return line.startswith(marker) and line[3:4] in ('', ' ', '\t', '\n', '\r')
+
+
+def split_documents(lines):
+    """Yield the source text of every document in an iterable of lines."""
+    buffer = []
+    directives = []
+    explicit = False  # the current document was opened with "---"
+    content = False   # the current document has more than blank lines and comments
+    for number, line in enumerate(lines):
+        if number == 0:
+            line = line.lstrip('\ufeff')
+        if _is_marker(line, '---'):
+            if explicit or content:
+                yield ''.join(buffer)
+            buffer = directives + [line]
+            directives = []
+            explicit, content = True, False
+        elif _is_marker(line, '...'):
+            if explicit or content:
+                yield ''.join(buffer)
+            buffer = []
+            explicit = content = False
+        elif not explicit and not content and line.startswith('%'):
+            directives.append(line)
+        else:
+            buffer.append(line)
+            if not content:
+                stripped = line.strip()
+                content = bool(stripped) and not stripped.startswith('#')
+    if explicit or content:
+        yield ''.join(buffer)
+
+
+def _flatten_batch(documents, backend):
+    loader = get_loader(backend)
+    return [list(iter_rows(loader.load(text))) for text in documents]
+
+
+def _batches(documents, batch_bytes):
+    # Group small documents so each task is worth the trip to a worker.
+    batch, size = [], 0
+    for text in documents:
+        batch.append(text)
+        size += len(text)
+        if size >= batch_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def iter_flattened_documents(lines, backend='pyyaml', workers=None, batch_bytes=64 * 1024):
+    """Yield the flattened rows of each document in lines, in file order.
+
+    Documents are parsed by a pool of `workers` processes (all CPUs by
+    default). Only a few batches per worker are in flight at a time, so a
+    huge stream is never held in memory all at once.
+    """
+    return _flatten_all(split_documents(lines), backend, workers, batch_bytes)
+
+
+def iter_flattened_file(file_path, backend='pyyaml', workers=None, batch_bytes=64 * 1024):
+    """Like iter_flattened_documents, for a file that is memory-mapped.
+
+    Documents are found by scanning the bytes of the mapping and each is
+    handed over as its own bytes slice, so the file is never decoded or
+    copied whole.
+    """
+    with mapped(file_path) as buffer:
+        documents = iter_documents(buffer, release=True)
+        try:
+            yield from _flatten_all(documents, backend, workers, batch_bytes)
+        finally:
+            documents.close()
+
+
+def _flatten_all(documents, backend, workers, batch_bytes):
+    workers = workers or os.cpu_count() or 1
+    batches = _batches(documents, batch_bytes)
+    if workers == 1:
+        for batch in batches:
+            yield from _flatten_batch(batch, backend)
+        return
+    # concurrent.futures is slow to import and only needed with a pool.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_flatten_batch, batch, backend))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
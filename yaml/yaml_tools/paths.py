@@ -0,0 +1,104 @@
+# yaml_tools/paths.py
+# Flattened paths as a tree of (parent, segment) entries.
+#
+# Spelling out "a.b[0].c" for every row copies each ancestor's prefix again,
+# which is O(depth) per level and quadratic for deeply nested documents. A
+# PathTable stores each path once as its parent's id plus one segment:
+# mapping keys are interned in `segments` and referenced by id, list
+# positions are stored as -(index + 1). The string is only built when it is
+# asked for, with one join over the chain of segments.
+#
+# The strings are exactly those flatten.iter_rows produces: top-level keys
+# keep their own type, everything below is "parent.key" or "parent[index]".
+
+from array import array
+
+ROOT = -1
+
+
+class PathTable:
+    """Interned path segments and a parent pointer per path."""
+
+    def __init__(self):
+        self.segments = []
+        self._segment_ids = {}
+        self.parents = array('i')
+        self.labels = array('i')
+
+    def __len__(self):
+        return len(self.parents)
+
+    def segment(self, key):
+        """Return the id of a mapping key, adding it on first use."""
+        # True == 1, but they print differently: intern non-str keys by type too.
+        token = key if type(key) is str else (type(key), key)
+        segment = self._segment_ids.get(token)
+        if segment is None:
+            segment = self._segment_ids[token] = len(self.segments)
+            self.segments.append(key)
+        return segment
+
+    def add_key(self, parent, key):
+        self.parents.append(parent)
+        self.labels.append(self.segment(key))
+        return len(self.parents) - 1
+
+    def add_index(self, parent, index):
+        self.parents.append(parent)
+        self.labels.append(-index - 1)
+        return len(self.parents) - 1
+
+    def parts(self, node):
+        """Return the segments of a path from the root: keys and int positions."""
+        parts = []
+        while node != ROOT:
+            label = self.labels[node]
+            parts.append(self.segments[label] if label >= 0 else -label - 1)
+            node = self.parents[node]
+        parts.reverse()
+        return parts
+
+    def path(self, node, cache=None):
+        """Build the path string of node.
+
+        cache, if given, maps nodes to the strings already built for them and
+        gets the paths of node's ancestors added, so rows that follow under
+        the same parents only spell their own segment.
+        """
+        links = []
+        while node != ROOT and (cache is None or node not in cache):
+            links.append(node)
+            node = self.parents[node]
+        path = '' if node == ROOT else cache[node]
+        links.reverse()
+        if cache is None:
+            return _spell([self._link(link) for link in links], path)
+        for link in links:
+            path = _spell((self._link(link),), path)
+            # Keep the paths of containers; a row's own node is not read twice.
+            if link != links[-1]:
+                cache[link] = path
+        return path
+
+    def _link(self, node):
+        label = self.labels[node]
+        return (True, self.segments[label]) if label >= 0 else (False, -label - 1)
+
+
+def _spell(chain, path=''):
+    # Same result as applying f"{p}.{key}" if p else key / f"{p}[{i}]" one
+    # (is_key, segment) link at a time from path, but with a single join.
+    # Only a path that is still empty (or a falsy top-level key) can be
+    # replaced by the next key.
+    position = 0
+    for is_key, segment in chain:
+        if path:
+            break
+        path = segment if is_key else f"{path}[{segment}]"
+        position += 1
+    if position == len(chain):
+        return path
+    parts = [f"{path}"]
+    for is_key, segment in chain[position:]:
+        parts.append(f".{segment}" if is_key else f"[{segment}]")
+    return ''.join(parts)
@@ -0,0 +1,202 @@
+# yaml_tools/render.py
+# Writes flattened rows as they are produced instead of collecting them first.
+#
+# tabulate needs the whole row list to size its columns, so nothing is printed
+# until the last row is flattened and every row is held twice. Here the grid
+# is sized from the first `sample` rows only (or from fixed widths, with no
+# buffering at all) and then streamed; a later cell wider than its column is
+# wrapped over several lines of the same row instead of widening the grid.
+#
+# Other formats need no sizing and write every row straight away:
+#   grid    tabulate-style grid (the default)
+#   ndjson  one JSON object per row
+#   csv     comma separated, with a header line
+#   tsv     tab separated, with a header line; tabs/newlines escaped
+#
+# Scripts pick the format from $YAML_TOOLS_FORMAT when none is given, e.g.
+#   YAML_TOOLS_FORMAT=ndjson python3 01_sample_yaml_file/sample_pyyaml.py
+#
+# Every lesson script imports this module, so anything only some formats or
+# the command line need is imported where it is used.
+
+import os
+import sys
+
+HEADERS = ['Key', 'Value', 'Key Type', 'Value Type']
+FORMATS = ['grid', 'ndjson', 'csv', 'tsv']
+DEFAULT_SAMPLE = 100
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _text(value):
+    # Same as tabulate: None is an empty cell.
+    return '' if value is None else str(value)
+
+
+def _cell(value):
+    # tabulate also drops the surrounding whitespace, e.g. a block scalar's final newline.
+    return _text(value).strip()
+
+
+def _lines(text, width):
+    lines = []
+    for line in text.split('\n'):
+        while len(line) > width:
+            lines.append(line[:width])
+            line = line[width:]
+        lines.append(line)
+    return lines
+
+
+class GridWriter:
+    """Streams rows as a grid, sizing the columns from the first rows seen."""
+
+    def __init__(self, out=None, headers=HEADERS, sample=DEFAULT_SAMPLE, widths=None, max_width=None):
+        self.out = out or sys.stdout
+        self.headers = list(headers)
+        self.sample = sample
+        self.max_width = max_width
+        self.widths = list(widths) if widths else None
+        self._pending = []
+        self.rows = 0
+
+    def write(self, row):
+        cells = [_cell(value) for value in row]
+        if self.widths is None:
+            self._pending.append(cells)
+            if len(self._pending) >= self.sample:
+                self._start()
+            return
+        self._write_row(cells)
+
+    def close(self):
+        if self.widths is None:
+            self._start()
+        if not self.rows:
+            # No rows: tabulate still prints the header.
+            self._write_header()
+            self.out.write(self._rule('-') + '\n')
+
+    def _start(self):
+        widths = [len(header) + 2 for header in self.headers]
+        for cells in self._pending:
+            for column, text in enumerate(cells):
+                widths[column] = max(widths[column], *(len(line) for line in text.split('\n')))
+        if self.max_width:
+            widths = [max(min(width, self.max_width), len(header))
+                      for width, header in zip(widths, self.headers)]
+        self.widths = widths
+        pending, self._pending = self._pending, []
+        for cells in pending:
+            self._write_row(cells)
+
+    def _rule(self, fill):
+        return '+' + '+'.join(fill * (width + 2) for width in self.widths) + '+'
+
+    def _lines(self, cells):
+        columns = [_lines(text, width) for text, width in zip(cells, self.widths)]
+        height = max(len(lines) for lines in columns)
+        for number in range(height):
+            yield '| ' + ' | '.join((lines[number] if number < len(lines) else '').ljust(width)
+                                    for lines, width in zip(columns, self.widths)) + ' |'
+
+    def _write_header(self):
+        write = self.out.write
+        write(self._rule('-') + '\n')
+        for line in self._lines([_cell(header) for header in self.headers]):
+            write(line + '\n')
+        write(self._rule('=') + '\n')
+
+    def _write_row(self, cells):
+        write = self.out.write
+        if not self.rows:
+            self._write_header()
+        for line in self._lines(cells):
+            write(line + '\n')
+        write(self._rule('-') + '\n')
+        self.rows += 1
+
+
+class _LineWriter:
+    def __init__(self, out, headers, fmt):
+        self.out = out or sys.stdout
+        self.fmt = fmt
+        self.rows = 0
+        # 'Key Type' -> 'key_type'
+        self.fields = [header.lower().replace(' ', '_') for header in headers]
+        if fmt == 'ndjson':
+            import json
+
+            self._dumps = json.dumps
+        if fmt == 'csv':
+            import csv
+
+            self._csv = csv.writer(self.out)
+            self._csv.writerow(headers)
+        elif fmt == 'tsv':
+            self.out.write('\t'.join(headers) + '\n')
+
+    def write(self, row):
+        if self.fmt == 'ndjson':
+            self.out.write(self._dumps(dict(zip(self.fields, row)), default=str) + '\n')
+        elif self.fmt == 'csv':
+            self._csv.writerow(['' if value is None else value for value in row])
+        else:
+            self.out.write('\t'.join(_text(value).translate(_TSV_ESCAPES) for value in row) + '\n')
+        self.rows += 1
+
+    def close(self):
+        pass
+
+
+def writer(fmt=None, out=None, headers=HEADERS, **grid_options):
+    """Return a row writer for fmt (default $YAML_TOOLS_FORMAT, else grid)."""
+    fmt = fmt or os.environ.get('YAML_TOOLS_FORMAT') or 'grid'
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown table format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if fmt == 'grid':
+        return GridWriter(out, headers, **grid_options)
+    return _LineWriter(out, headers, fmt)
+
+
+def print_table(rows, fmt=None, out=None, headers=HEADERS, **grid_options):
+    """Write rows as they come from an iterator; returns the number written."""
+    table = writer(fmt, out, headers, **grid_options)
+    for row in rows:
+        table.write(row)
+    table.close()
+    return table.rows
+
+
+def main(argv=None):
+    import argparse
+    import itertools
+
+    from yaml_tools.events import iter_event_rows
+
+    parser = argparse.ArgumentParser(description='Stream the flattened rows of a YAML file.')
+    parser.add_argument('file')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--format', choices=FORMATS, default=None)
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE,
+                        help='rows used to size the grid columns')
+    parser.add_argument('--widths', help='fixed grid column widths, e.g. 40,60,10,10 (no sampling)')
+    parser.add_argument('--max-width', type=int, default=None, help='widest grid column; wider cells wrap')
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many rows')
+    args = parser.parse_args(argv)
+
+    widths = [int(width) for width in args.widths.split(',')] if args.widths else None
+    with open(args.file, 'r') as file:
+        rows = iter_event_rows(file, args.backend)
+        if args.limit is not None:
+            rows = itertools.islice(rows, args.limit)
+        try:
+            print_table(rows, args.format, sample=args.sample, widths=widths, max_width=args.max_width)
+        except BrokenPipeError:
+            # `| head` closed the pipe; keep the interpreter from complaining on exit.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == "__main__":
+    main()
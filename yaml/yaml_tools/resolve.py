@@ -0,0 +1,163 @@
+# yaml_tools/resolve.py
+# Faster implicit typing of plain scalars for the PyYAML loaders.
+#
+# PyYAML decides the type of every unquoted scalar ("30", "true",
+# "2034-07-23T10:20:00Z") by trying the regexes registered for its first
+# character, and builds a fresh list of candidates for every scalar to do
+# so. On documents that are mostly timestamps and numbers this resolution,
+# and constructing the same ints and dates again and again, is a large part
+# of the load time. Here:
+#   - the candidates for every first character are computed once, as tuples
+#     (the first-character dispatch table),
+#   - all-digit ints and timestamp-shaped scalars are checked against the
+#     one regex they can match before anything else,
+#   - the tag of a scalar text, and the int/float/bool/null/timestamp built
+#     from it, are cached (the safe loaders have no path resolvers, so a
+#     plain scalar's type depends on its text alone).
+# The loaded data is the same as with the stock loaders.
+#
+# Two opt-in modes skip typing instead:
+#   strings  plain scalars stay str ("30", "true", "null")
+#   lazy     plain scalars are LazyScalar, a str whose .value is the typed
+#            value, resolved (and cached) only when it is asked for
+# Quoted scalars and explicit tags (!!int "30", !!binary) are typed as usual
+# in every mode.
+#
+# The dispatch table is built when loader_class first sees a base class;
+# implicit resolvers must be added to the base before that.
+
+import re
+
+TYPINGS = ('implicit', 'strings', 'lazy')
+CACHE_LIMIT = 65536
+
+LAZY_TAG = 'tag:yaml_tools,2024:lazy'
+_INT_TAG = 'tag:yaml.org,2002:int'
+_TIMESTAMP_TAG = 'tag:yaml.org,2002:timestamp'
+_STR_TAG = 'tag:yaml.org,2002:str'
+_CACHED_TAGS = ('tag:yaml.org,2002:null', 'tag:yaml.org,2002:bool', _INT_TAG,
+                'tag:yaml.org,2002:float', _TIMESTAMP_TAG)
+_OCTAL = re.compile(r'0[0-7]*\Z')
+
+
+class LazyScalar(str):
+    """The text of a plain scalar; .value is its typed value, built on first use."""
+
+    __slots__ = ()
+
+    @property
+    def value(self):
+        return resolve_scalar(str(self))
+
+
+def _timestamp_regexp(resolver_class):
+    for tag, regexp in resolver_class.yaml_implicit_resolvers.get('2', ()):
+        if tag == _TIMESTAMP_TAG:
+            return regexp
+    return None
+
+
+def _cached_constructor(construct):
+    cache = {}
+
+    def constructor(self, node):
+        value = cache.get(node.value, cache)
+        if value is cache:
+            value = construct(self, node)
+            if len(cache) < CACHE_LIMIT:
+                cache[node.value] = value
+        return value
+
+    return constructor
+
+
+_classes = {}
+
+
+def loader_class(base, typing='implicit'):
+    """Return a subclass of the PyYAML loader class base using the fast path.
+
+    typing is one of TYPINGS; the classes are built once per base and typing.
+    """
+    if typing not in TYPINGS:
+        raise ValueError(f"unknown typing {typing!r}, expected one of {list(TYPINGS)}")
+    key = (base, typing)
+    if key not in _classes:
+        _classes[key] = _build(base, typing)
+    return _classes[key]
+
+
+def _build(base, typing):
+    from yaml.nodes import ScalarNode
+
+    tags = {}
+    timestamp = _timestamp_regexp(base)
+    # first character -> ((tag, regexp), ...), wildcard resolvers included.
+    wildcard = tuple(base.yaml_implicit_resolvers.get(None, ()))
+    candidates = {first: tuple(resolvers) + wildcard
+                  for first, resolvers in base.yaml_implicit_resolvers.items() if first is not None}
+
+    scalars = {}    # tag -> cached constructor, for construct_object's fast path
+
+    class FastLoader(base):
+        yaml_constructors = dict(base.yaml_constructors)
+
+        def construct_object(self, node, deep=False):
+            # Scalars need none of the bookkeeping for recursive and aliased
+            # collections: build them straight from the (cached) constructor.
+            if node.__class__ is ScalarNode:
+                if node.tag == _STR_TAG:
+                    return node.value
+                construct = scalars.get(node.tag)
+                if construct is not None:
+                    return construct(self, node)
+            return super().construct_object(node, deep)
+
+        def resolve(self, kind, value, implicit):
+            if kind is not ScalarNode or not implicit[0]:
+                return super().resolve(kind, value, implicit)
+            if typing != 'implicit' and value != '<<':
+                return LAZY_TAG if typing == 'lazy' else _STR_TAG
+            tag = tags.get(value)
+            if tag is not None:
+                return tag
+            if value.isascii() and value.isdigit() and (value[0] != '0' or _OCTAL.match(value)):
+                tag = _INT_TAG
+            elif timestamp is not None and value[4:5] == '-' and timestamp.match(value):
+                tag = _TIMESTAMP_TAG
+            else:
+                for candidate, regexp in candidates.get(value[:1], wildcard):
+                    if regexp.match(value):
+                        tag = candidate
+                        break
+                else:
+                    tag = super().resolve(kind, value, (False, implicit[1]))
+            if len(tags) < CACHE_LIMIT:
+                tags[value] = tag
+            return tag
+
+    for tag in _CACHED_TAGS:
+        if tag in FastLoader.yaml_constructors:
+            scalars[tag] = FastLoader.yaml_constructors[tag] = _cached_constructor(
+                FastLoader.yaml_constructors[tag])
+    if typing == 'lazy':
+        scalars[LAZY_TAG] = FastLoader.yaml_constructors[LAZY_TAG] = lambda self, node: LazyScalar(node.value)
+    FastLoader.__name__ = FastLoader.__qualname__ = f"Fast{base.__name__}" + (
+        '' if typing == 'implicit' else f"[{typing}]")
+    return FastLoader
+
+
+_resolver = None
+
+
+def resolve_scalar(text):
+    """Return the typed value of a plain scalar's text, as the safe loader would build it."""
+    global _resolver
+    if _resolver is None:
+        import yaml
+
+        _resolver = loader_class(yaml.SafeLoader)('')
+    from yaml.nodes import ScalarNode
+
+    tag = _resolver.resolve(ScalarNode, text, (True, False))
+    return _resolver.yaml_constructors[tag](_resolver, ScalarNode(tag, text))
@@ -0,0 +1,214 @@
+# yaml_tools/rowstore.py
+# A compact, column-oriented home for millions of flattened rows.
+#
+# A list of (path, value, key_type, value_type) tuples costs a tuple and a
+# fresh path string per row. RowStore keeps instead, on top of the path
+# nodes of a paths.PathTable:
+#   segments      every distinct mapping key once (interned)
+#   parents       array('i'): parent node of every path node (-1 for the root)
+#   labels        array('i'): segment id of a node, or -(index + 1) for a
+#                 list position
+#   nodes         array('i'): the path node of every row
+#   key_types     array('B'): type-name ids of the key and value of every row
+#   value_types
+#   values        the values themselves
+# A path node exists once however many rows are below it, and path strings
+# are only built when a row is read back out.
+#
+#   python3 -m yaml_tools.rowstore 00_real_yaml_files/kubernetes.yml
+
+import sys
+from array import array
+
+from yaml_tools.flatten import DEFAULT_MAX_ALIAS_ROWS, AliasExpansionError, _shared_containers
+from yaml_tools.paths import ROOT, PathTable
+
+
+class RowStore(PathTable):
+    """Flattened rows of one or more documents stored column by column."""
+
+    def __init__(self):
+        super().__init__()
+        self.type_names = []
+        self._type_ids = {}
+        self.nodes = array('i')
+        self.key_types = array('B')
+        self.value_types = array('B')
+        self.values = []
+        self.documents = array('I')   # index of the first row of every document
+
+    @classmethod
+    def from_documents(cls, documents, parent_key='', max_alias_rows=DEFAULT_MAX_ALIAS_ROWS):
+        store = cls()
+        for data in documents:
+            store.add_document(data, parent_key, max_alias_rows)
+        return store
+
+    # -- building ---------------------------------------------------------
+
+    def _type(self, value):
+        name = type(value).__name__
+        code = self._type_ids.get(name)
+        if code is None:
+            if len(self.type_names) == 256:
+                raise OverflowError('more than 256 distinct value types')
+            code = self._type_ids[name] = len(self.type_names)
+            self.type_names.append(name)
+        return code
+
+    def _append(self, node, key, value):
+        self.nodes.append(node)
+        self.key_types.append(self._type(key))
+        self.value_types.append(self._type(value))
+        self.values.append(value)
+
+    def add_document(self, data, parent_key='', max_alias_rows=DEFAULT_MAX_ALIAS_ROWS):
+        """Flatten data into the store; rows and order match flatten.iter_rows."""
+        self.documents.append(len(self.values))
+        root = self.add_key(ROOT, parent_key) if parent_key else ROOT
+        if not isinstance(data, (dict, list)):
+            self._append(root, parent_key, data)
+            return
+        shared = _shared_containers(data)
+        walked = set()      # shared containers already stored once
+        active = set()      # containers on the current path, to catch cycles
+        alias_rows = 0
+        # Bound methods and tables as locals: this loop runs once per row.
+        parents, add_parent, add_label = self.parents, self.parents.append, self.labels.append
+        add_node, add_key_type = self.nodes.append, self.key_types.append
+        add_value_type, add_value = self.value_types.append, self.values.append
+        type_ids = self._type_ids
+        # iter_rows keeps keys raw (not str) while the path is still falsy:
+        # at the top, and under falsy top-level keys such as null, 0 or "".
+        # Each frame: [children, node, container id, inside a repeated alias, keys raw]
+        raw = not parent_key and isinstance(data, dict)
+        stack = [[self._children_of(data, raw), root, id(data), False, raw]]
+        active.add(id(data))
+        while stack:
+            frame = stack[-1]
+            for label, key, value in frame[0]:
+                node = len(parents)
+                add_parent(frame[1])
+                add_label(label)
+                if isinstance(value, (dict, list)):
+                    value_id = id(value)
+                    if value_id in active:
+                        raise AliasExpansionError(f"recursive alias at {self.path(node)!r}")
+                    repeated = frame[3]
+                    if value_id in shared:
+                        repeated = repeated or value_id in walked
+                        walked.add(value_id)
+                    active.add(value_id)
+                    raw = frame[4] and not key and isinstance(value, dict)
+                    stack.append([self._children_of(value, raw), node, value_id, repeated, raw])
+                    break
+                if frame[3]:
+                    alias_rows += 1
+                    if max_alias_rows is not None and alias_rows > max_alias_rows:
+                        raise AliasExpansionError(
+                            f"aliases expand to more than {max_alias_rows} rows (at {self.path(node)!r})")
+                key_type = type_ids.get(type(key).__name__)
+                value_type = type_ids.get(type(value).__name__)
+                add_node(node)
+                add_key_type(self._type(key) if key_type is None else key_type)
+                add_value_type(self._type(value) if value_type is None else value_type)
+                add_value(value)
+            else:
+                stack.pop()
+                active.discard(frame[2])
+
+    def _children_of(self, value, raw):
+        # Yields (label, key as iter_rows would type it, value).
+        if isinstance(value, list):
+            return ((-index, '', item) for index, item in enumerate(value, 1))
+        ids, segment = self._segment_ids, self.segment
+        if raw:
+            return ((segment(key), key, item) for key, item in value.items())
+        return ((ids.get(key) if type(key) is str and key in ids else segment(key), '', item)
+                for key, item in value.items())
+
+    # -- reading ----------------------------------------------------------
+
+    def __len__(self):
+        # Rows, not path nodes.
+        return len(self.values)
+
+    def row(self, index, _cache=None):
+        key = self.path(self.nodes[index], _cache)
+        return (key, self.values[index], self.type_names[self.key_types[index]],
+                self.type_names[self.value_types[index]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            cache = {}
+            return [self.row(i, cache) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('row index out of range')
+        return self.row(index)
+
+    def __iter__(self):
+        # Parent paths are cached only while their rows are being read.
+        cache = {}
+        for index in range(len(self)):
+            if len(cache) > 4096:
+                cache.clear()
+            yield self.row(index, cache)
+
+    def document(self, number):
+        """Return the rows of one document as a list."""
+        start = self.documents[number]
+        end = self.documents[number + 1] if number + 1 < len(self.documents) else len(self)
+        return self[start:end]
+
+    def export(self, fmt=None, out=None):
+        """Write every row through yaml_tools.render in any of its formats."""
+        from yaml_tools.render import print_table
+
+        return print_table(iter(self), fmt, out)
+
+    def nbytes(self):
+        """Bytes used by the columns, not counting the value and key objects."""
+        arrays = (self.parents, self.labels, self.nodes, self.key_types, self.value_types, self.documents)
+        return (sum(column.itemsize * len(column) for column in arrays)
+                + sys.getsizeof(self.values) + sys.getsizeof(self.segments)
+                + sys.getsizeof(self._segment_ids))
+
+
+def main(argv=None):
+    import argparse
+    import time
+    import tracemalloc
+
+    from yaml_tools.flatten import iter_rows
+    from yaml_tools.loaders import get_loader
+
+    parser = argparse.ArgumentParser(description='Compare a RowStore with a list of row tuples.')
+    parser.add_argument('file')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    args = parser.parse_args(argv)
+
+    with open(args.file, 'rb') as file:
+        documents = list(get_loader(args.backend).load_all(file))
+    built = []
+    for name, build in (('list of rows', lambda: [row for data in documents for row in iter_rows(data)]),
+                        ('RowStore', lambda: RowStore.from_documents(documents))):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = build()
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{name:<14}{len(rows):>10} rows{used / 1024:>12.0f} KiB{elapsed:>9.2f} s")
+        built.append(rows)
+    # Same rows, key and value types included.
+    for index, (expected, stored) in enumerate(zip(built[0], built[1])):
+        if expected != stored:
+            print(f"row {index} differs: {expected!r} != {stored!r}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
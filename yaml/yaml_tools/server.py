@@ -0,0 +1,177 @@
+# yaml_tools/server.py
+# Pre-forked warm workers for running `python3 -m yaml_tools` many times.
+#
+# `serve` imports the CLI and builds the parser once, binds a Unix socket and
+# forks `workers` children that all accept on it. A request is the argument
+# list of one `python3 -m yaml_tools` run; a child runs it in-process (so
+# without its own pool) and streams stdout/stderr back. `run` is the client:
+# it only needs the standard library modules every interpreter loads anyway,
+# so a tiny file costs one interpreter start plus the parse, not the imports.
+#
+#   python3 -m yaml_tools.server serve --workers 4 &
+#   python3 -m yaml_tools.server run 00_real_yaml_files --format ndjson
+#
+# Wire format: the client sends one JSON line {"argv": [...], "cwd": "..."};
+# the server answers with frames "<channel> <length>\n<bytes>", channel 1 for
+# stdout and 2 for stderr, and a last "x <exit status>\n".
+
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.environ.get('YAML_TOOLS_SOCKET') or f"/tmp/yaml_tools-{os.getuid()}.sock"
+_FLUSH_BYTES = 64 * 1024
+
+
+class _Channel:
+    """File-like object that sends what is written as frames on one channel."""
+
+    def __init__(self, sock, channel):
+        self._sock = sock
+        self._channel = channel
+        self._buffer = []
+        self._size = 0
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= _FLUSH_BYTES:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            data = ''.join(self._buffer).encode('utf-8')
+            self._buffer, self._size = [], 0
+            self._sock.sendall(f"{self._channel} {len(data)}\n".encode('ascii') + data)
+
+
+def _handle(connection):
+    import json
+    import traceback
+
+    from yaml_tools.cli import main as cli_main
+
+    request = json.loads(connection.makefile('rb').readline())
+    stdout, stderr = _Channel(connection, 1), _Channel(connection, 2)
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        os.chdir(request.get('cwd') or '/')
+        # The worker is the pool: never fork a second one per request.
+        status = cli_main(list(request['argv']) + ['--workers', '1'])
+    except SystemExit as error:
+        # argparse errors and --help end up here.
+        status = error.code if isinstance(error.code, int) else 2
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout, sys.stderr = saved
+    stdout.flush()
+    stderr.flush()
+    connection.sendall(f"x {status or 0}\n".encode('ascii'))
+
+
+def _worker_loop(listener):
+    while True:
+        connection, _ = listener.accept()
+        with connection:
+            try:
+                _handle(connection)
+            except (OSError, ValueError):
+                # The client went away or sent garbage; wait for the next one.
+                pass
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, backend='pyyaml'):
+    """Warm up, fork the workers and wait for them until interrupted."""
+    import signal
+
+    # Import everything a request needs before forking so the children inherit it.
+    import json
+    import traceback
+    from yaml_tools import cli
+    from yaml_tools.loaders import get_loader
+
+    get_loader(backend)
+    workers = workers or os.cpu_count() or 1
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker_loop(listener)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"# {workers} workers on {socket_path}", file=sys.stderr)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        listener.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def run(argv, socket_path=DEFAULT_SOCKET):
+    """Send one CLI invocation to the server and copy its output; return the exit status."""
+    import json
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd()}).encode('utf-8') + b'\n')
+        replies = client.makefile('rb')
+        outputs = {b'1': sys.stdout.buffer, b'2': sys.stderr.buffer}
+        while True:
+            header = replies.readline()
+            if not header:
+                raise ConnectionError('server closed the connection')
+            channel, value = header.split()
+            if channel == b'x':
+                sys.stdout.flush()
+                return int(value)
+            outputs[channel].write(replies.read(int(value)))
+            outputs[channel].flush()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("usage: python -m yaml_tools.server serve [--socket PATH] [--workers N] [--backend NAME]\n"
+             "       python -m yaml_tools.server run [--socket PATH] <yaml_tools arguments>")
+    if not argv or argv[0] not in ('serve', 'run'):
+        sys.exit(usage)
+    command, argv = argv[0], argv[1:]
+    socket_path = DEFAULT_SOCKET
+    if argv[:1] == ['--socket'] and len(argv) > 1:
+        socket_path, argv = argv[1], argv[2:]
+    if command == 'run':
+        try:
+            sys.exit(run(argv, socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            sys.exit(f"no yaml_tools server on {socket_path}; start one with: python -m yaml_tools.server serve")
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m yaml_tools.server serve')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    args = parser.parse_args(argv)
+    serve(socket_path, args.workers, args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# yaml_tools/startup.py
+# Shows where the time of one short run goes: interpreter start, imports,
+# building the parser, parsing, flattening and rendering.
+#
+# The run happens in a fresh interpreter started with -X importtime, so the
+# numbers are those of a cold `python3 <script>` and not of this process.
+# Imports are summed per top-level package from the -X importtime report.
+#
+#   python3 -m yaml_tools.startup 01_sample_yaml_file/sample.yml --backend ruamel
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+
+from yaml_tools.render import FORMATS
+
+YAML_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child; prints the phase timings on stdout without importing
+# anything more.
+_PROBE = '''
+import sys, time
+start = time.perf_counter()
+phases = []
+def mark(name):
+    global start
+    now = time.perf_counter()
+    phases.append((name, now - start))
+    start = now
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.render import print_table
+mark('import yaml_tools')
+loader = get_loader(sys.argv[2])
+mark('import + build parser')
+with open(sys.argv[1], 'r') as file:
+    documents = list(loader.load_all(file))
+mark('parse')
+rows = [row for document in documents for row in iter_rows(document)]
+mark('flatten')
+with open('/dev/null', 'w') as out:
+    print_table(rows, sys.argv[3], out)
+mark('render')
+print(repr(phases))
+'''
+
+
+def parse_importtime(text):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output."""
+    modules = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def by_package(modules):
+    """Sum the self time of every module under its top-level package."""
+    totals = {}
+    for name, (self_us, _, _) in modules.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def profile(file_path, backend='pyyaml', fmt='grid'):
+    """Run one cold inspection of file_path; return (phases, modules, wall_seconds)."""
+    command = [sys.executable, '-X', 'importtime', '-c', _PROBE, file_path, backend, fmt]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [YAML_ROOT, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    phases = [list(phase) for phase in ast.literal_eval(result.stdout)]
+    # Whatever the probe did not time is interpreter start-up and shutdown.
+    phases.insert(0, ['interpreter', wall - sum(seconds for _, seconds in phases)])
+    return phases, parse_importtime(result.stderr), wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Break down the start-up time of one YAML inspection.')
+    parser.add_argument('file')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--format', default='grid', choices=FORMATS)
+    parser.add_argument('--top', type=int, default=10, help='packages to list')
+    args = parser.parse_args(argv)
+
+    phases, modules, wall = profile(os.path.abspath(args.file), args.backend, args.format)
+    print(f"{'phase':<24}{'ms':>9}{'share':>8}")
+    for name, seconds in phases:
+        print(f"{name:<24}{seconds * 1000:>9.1f}{seconds / wall:>8.0%}")
+    print(f"{'total':<24}{wall * 1000:>9.1f}")
+    imports = sum(self_us for self_us, _, _ in modules.values())
+    print(f"\n{'imports by package':<24}{'ms':>9}{'share':>8}")
+    for package, self_us in by_package(modules)[:args.top]:
+        print(f"{package:<24}{self_us / 1000:>9.1f}{self_us / imports:>8.0%}")
+    print(f"{'all imports':<24}{imports / 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
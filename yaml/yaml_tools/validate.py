@@ -0,0 +1,283 @@
+# yaml_tools/validate.py
+# Checks YAML/JSON configuration files against a small schema, fast.
+#
+# The schema is a subset of JSON Schema, itself written in YAML or JSON:
+#   type: object
+#   required: [host, port, username, password]
+#   properties:
+#     port: {type: integer, minimum: 1, maximum: 65535}
+#     servers: {type: array, items: {type: object, required: [name]}}
+#     mode: {enum: [dev, prod]}
+# Supported keywords: type (object, array, string, integer, number, boolean,
+# null, or a list of them), required, properties, items, enum, minimum,
+# maximum, minLength, maxLength, minItems, maxItems.
+#
+# compile_schema turns the nested schema into a flat list of
+# (steps, checks) entries once, steps being the keys and "[*]" list
+# wildcards that lead to the checked value. Validating a document is then a
+# loop over that list instead of a recursive walk of the schema for every
+# file. Errors carry the path of the offending value spelled the way
+# flatten.iter_rows spells it ("servers[0].name").
+#
+#   python3 -m yaml_tools.validate schema.yml configs/ --workers 4
+#   python3 -m yaml_tools.validate --require host,port,username,password config.json
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+ANY_INDEX = '[*]'
+
+_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+_KEYWORDS = {'type', 'required', 'properties', 'items', 'enum', 'minimum', 'maximum',
+             'minLength', 'maxLength', 'minItems', 'maxItems'}
+
+# Set by _init_worker in every pool process (and in-process for --workers 1).
+_worker = {}
+
+
+class SchemaError(ValueError):
+    """Raised for a schema that uses unknown keywords or types."""
+
+
+def compile_schema(schema):
+    """Return the flat list of (steps, checks) a schema asks for.
+
+    checks is a tuple of (keyword, argument) pairs, "type" first, so a value
+    of the wrong type is reported once instead of by every check after it.
+    """
+    compiled = []
+    stack = [((), schema)]
+    while stack:
+        steps, node = stack.pop()
+        if not isinstance(node, dict):
+            raise SchemaError(f"schema at {_spell(steps) or '<root>'} is not a mapping")
+        unknown = set(node) - _KEYWORDS
+        if unknown:
+            raise SchemaError(f"unsupported keywords at {_spell(steps) or '<root>'}: {sorted(unknown)}")
+        checks = []
+        if 'type' in node:
+            names = node['type'] if isinstance(node['type'], list) else [node['type']]
+            for name in names:
+                if name not in _TYPES:
+                    raise SchemaError(f"unknown type {name!r} at {_spell(steps) or '<root>'}")
+            checks.append(('type', tuple(names)))
+        for keyword in ('enum', 'minimum', 'maximum', 'minLength', 'maxLength', 'minItems', 'maxItems'):
+            if keyword in node:
+                checks.append((keyword, node[keyword]))
+        for key in node.get('required', ()):
+            checks.append(('required', key))
+        if checks:
+            compiled.append((steps, tuple(checks)))
+        # Children are pushed in reverse so the list comes out in schema order.
+        children = [(steps + (key,), child) for key, child in node.get('properties', {}).items()]
+        if 'items' in node:
+            children.append((steps + (ANY_INDEX,), node['items']))
+        stack.extend(reversed(children))
+    return compiled
+
+
+def _spell(steps):
+    path = ''
+    for step in steps:
+        if step == ANY_INDEX:
+            path = f"{path}[*]"
+        else:
+            path = f"{path}.{step}" if path else step
+    return path
+
+
+def _resolve(data, steps):
+    # Yields (path, value) for every value the steps lead to; a missing key
+    # or a non-container on the way yields nothing, as "required" and "type"
+    # on the parent already report it.
+    matches = [('', data)]
+    for step in steps:
+        found = []
+        if step == ANY_INDEX:
+            for path, value in matches:
+                if isinstance(value, list):
+                    found.extend((f"{path}[{index}]", item) for index, item in enumerate(value))
+        else:
+            for path, value in matches:
+                if isinstance(value, dict) and step in value:
+                    found.append(((f"{path}.{step}" if path else step), value[step]))
+        matches = found
+        if not matches:
+            break
+    return matches
+
+
+def _size(value):
+    return len(value) if isinstance(value, (str, list, dict)) else None
+
+
+def validate(data, compiled):
+    """Return a list of (path, keyword, message) errors for one parsed document."""
+    errors = []
+    for steps, checks in compiled:
+        for path, value in _resolve(data, steps):
+            for keyword, argument in checks:
+                if keyword == 'type':
+                    if not any(_TYPES[name](value) for name in argument):
+                        errors.append((path, keyword, f"expected {' or '.join(argument)}, "
+                                                      f"got {type(value).__name__}"))
+                        break
+                elif keyword == 'required':
+                    if isinstance(value, dict) and argument not in value:
+                        errors.append((f"{path}.{argument}" if path else argument, keyword,
+                                       f"missing required key {argument!r}"))
+                elif keyword == 'enum':
+                    if value not in argument:
+                        errors.append((path, keyword, f"{value!r} is not one of {argument!r}"))
+                else:
+                    if keyword in ('minimum', 'maximum'):
+                        measured = value if _TYPES['number'](value) else None
+                        what = repr(value)
+                    else:
+                        measured = _size(value)
+                        what = f"length {measured}"
+                    if measured is None:
+                        continue
+                    if keyword.startswith('min') and measured < argument:
+                        errors.append((path, keyword, f"{what} is below {argument!r}"))
+                    elif keyword.startswith('max') and measured > argument:
+                        errors.append((path, keyword, f"{what} is above {argument!r}"))
+    return errors
+
+
+def _load_documents(path, backend):
+    # Documents are parsed one at a time as they are validated. A stream with
+    # no document (an empty file, or only comments) is one null document, as
+    # loader.load reads it, so "type" and "required" still report it.
+    with open(path, 'rb') as file:
+        if path.endswith('.json'):
+            yield json.load(file)
+            return
+        from yaml_tools.loaders import get_loader
+
+        empty = True
+        for data in get_loader(backend).load_all(file):
+            empty = False
+            yield data
+        if empty:
+            yield None
+
+
+def validate_file(path, compiled, backend='pyyaml'):
+    """Return (document number, path, keyword, message) for every error in a file."""
+    errors = []
+    for number, data in enumerate(_load_documents(path, backend)):
+        errors.extend((number,) + error for error in validate(data, compiled))
+    return errors
+
+
+def _init_worker(compiled, backend):
+    from yaml_tools.loaders import get_loader
+
+    # Import and build the parser now, not on the first file.
+    get_loader(backend)
+    _worker['compiled'] = compiled
+    _worker['backend'] = backend
+
+
+def _validate_chunk(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((path, validate_file(path, _worker['compiled'], _worker['backend']), None))
+        except Exception as exc:
+            results.append((path, [], f"{type(exc).__name__}: {exc}".splitlines()[0]))
+    return results
+
+
+def validate_files(paths, compiled, backend='pyyaml', workers=None, chunk=64):
+    """Yield (path, errors, failure) for every path, in order, from a process pool."""
+    from yaml_tools.cli import iter_chunks
+
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(paths, chunk)
+    if workers == 1:
+        _init_worker(compiled, backend)
+        for paths in chunks:
+            yield from _validate_chunk(paths)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(compiled, backend)) as pool:
+        pending = deque()
+        for paths in chunks:
+            pending.append(pool.submit(_validate_chunk, paths))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    from yaml_tools.cli import iter_files
+
+    parser = argparse.ArgumentParser(description='Validate YAML/JSON files against a schema.')
+    parser.add_argument('targets', nargs='+', help='the schema file (unless --require is given), '
+                                                   'then files, directories or globs')
+    parser.add_argument('--require', help='comma separated top-level keys, instead of a schema file')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--workers', type=int, default=0, help='worker processes (0 = all CPUs, 1 = no pool)')
+    parser.add_argument('--format', choices=['text', 'ndjson'], default='text')
+    parser.add_argument('--chunk', type=int, default=64, help='files handed to a worker at a time')
+    args = parser.parse_args(argv)
+
+    targets = args.targets
+    if args.require:
+        schema = {'type': 'object', 'required': [key.strip() for key in args.require.split(',') if key.strip()]}
+    else:
+        if len(targets) < 2:
+            parser.error('give a schema file and at least one target, or --require')
+        schema = next(_load_documents(targets[0], args.backend), None)
+        targets = targets[1:]
+    try:
+        compiled = compile_schema(schema)
+    except SchemaError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    files = invalid = failed = 0
+    results = validate_files(iter_files(targets, ('.yml', '.yaml', '.json')), compiled, args.backend,
+                             args.workers or None, args.chunk)
+    for path, errors, failure in results:
+        files += 1
+        invalid += bool(errors)
+        failed += failure is not None
+        if args.format == 'ndjson':
+            if failure is not None:
+                print(json.dumps({'file': path, 'document': None, 'path': None,
+                                  'error': 'load', 'message': failure}))
+            for number, key, keyword, message in errors:
+                print(json.dumps({'file': path, 'document': number + 1, 'path': key,
+                                  'error': keyword, 'message': message}, default=str))
+        elif failure is not None:
+            print(f"{path}: {failure}")
+        elif errors:
+            for number, key, keyword, message in errors:
+                print(f"{path} [{number + 1}] {key}: {message}")
+        else:
+            print(f"{path}: Valid")
+    wall = time.perf_counter() - start
+    print(f"# {files} files, {invalid} invalid, {failed} unreadable in {wall:.2f} s", file=sys.stderr)
+    return 1 if invalid or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# yaml_tools/watch.py
+# Re-flattens only the parts of a YAML file that changed since the last look.
+#
+# A file is cut into documents at its "---" / "..." markers and every document
+# into top-level sections, one per line that starts a top-level key at column
+# 0, by scanning its bytes (yaml_tools.mmapio). Each section is parsed on its
+# own ({key: value}) and its rows are kept under the section's content hash.
+# After an edit only the sections whose bytes changed are parsed again, and
+# the rows they produced are compared with the rows they replaced to give a
+# row-level diff.
+#
+# A document is treated as a single section when its sections cannot stand
+# alone: it uses anchors/aliases, complex keys ("? ..."), or a section fails
+# to parse by itself (e.g. a flow collection continued at column 0).
+#
+#   python3 -m yaml_tools.watch 00_real_yaml_files/kubernetes.yml
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+from yaml_tools.flatten import iter_rows
+from yaml_tools.loaders import get_loader
+from yaml_tools.mmapio import document_spans, section_spans
+
+ADDED, REMOVED, CHANGED = '+', '-', '~'
+
+# An anchor or alias token: & or * right after whitespace or a flow indicator.
+_ANCHOR = re.compile(rb'(?:^|[\s,\[\{])[&*][^\s,\[\]\{\}]', re.MULTILINE)
+_COMPLEX_KEY = re.compile(rb'^[?:](?:\s|$)', re.MULTILINE)
+
+
+def _digest(buffer, start, end):
+    return hashlib.blake2b(memoryview(buffer)[start:end], digest_size=16).digest()
+
+
+class IncrementalFlattener:
+    """Keeps the rows of a file per section and updates them from new text."""
+
+    def __init__(self, backend='pyyaml'):
+        self.loader = get_loader(backend)
+        self.documents = []   # per document: list of (digest, rows)
+        self.parsed = 0       # sections parsed by the last update
+
+    def rows(self):
+        for number, sections in enumerate(self.documents):
+            for _, rows in sections:
+                for row in rows:
+                    yield number, row
+
+    def _document_sections(self, buffer, start, end, previous):
+        whole = [(start, end)]
+        if ((buffer.find(b'&', start, end) >= 0 or buffer.find(b'*', start, end) >= 0)
+                and _ANCHOR.search(buffer, start, end)) or _COMPLEX_KEY.search(buffer, start, end):
+            parts = whole
+        else:
+            parts = section_spans(buffer, start, end)
+        try:
+            return self._parse_parts(buffer, parts, previous)
+        except Exception:
+            if parts is whole:
+                raise
+            return self._parse_parts(buffer, whole, previous)
+
+    def _parse_parts(self, buffer, parts, previous):
+        sections = []
+        for start, end in parts:
+            digest = _digest(buffer, start, end)
+            rows = previous.get(digest)
+            if rows is None:
+                data = self.loader.load(buffer[start:end])
+                self.parsed += 1
+                # Sections are only independent when each is one top-level key.
+                if len(parts) > 1 and not (isinstance(data, dict) and len(data) == 1):
+                    raise ValueError('section does not stand alone')
+                rows = list(iter_rows(data))
+            sections.append((digest, rows))
+        return sections
+
+    def update(self, data):
+        """Replace the file contents (str or bytes) and return the list of row changes."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.parsed = 0
+        documents = []
+        for number, (start, end) in enumerate(document_spans(data)):
+            old = self.documents[number] if number < len(self.documents) else []
+            documents.append(self._document_sections(data, start, end, dict(old)))
+        changes = []
+        for number in range(max(len(documents), len(self.documents))):
+            old = self.documents[number] if number < len(self.documents) else []
+            new = documents[number] if number < len(documents) else []
+            changes.extend(_diff_sections(number, old, new))
+        self.documents = documents
+        return changes
+
+
+def _diff_sections(number, old, new):
+    old_digests = {digest for digest, _ in old}
+    new_digests = {digest for digest, _ in new}
+    before = {}
+    for digest, rows in old:
+        if digest not in new_digests:
+            for row in rows:
+                before[row[0]] = row
+    after = {}
+    for digest, rows in new:
+        if digest not in old_digests:
+            for row in rows:
+                after[row[0]] = row
+    changes = []
+    for path, row in after.items():
+        previous = before.pop(path, None)
+        if previous is None:
+            changes.append((ADDED, number, row))
+        elif previous[1:] != row[1:] or type(previous[1]) is not type(row[1]):
+            changes.append((CHANGED, number, previous, row))
+    for row in before.values():
+        changes.append((REMOVED, number, row))
+    return changes
+
+
+def format_change(change):
+    kind, number = change[0], change[1]
+    if kind == CHANGED:
+        old, new = change[2], change[3]
+        return f"{kind} [{number + 1}] {new[0]}: {old[1]!r} -> {new[1]!r}"
+    row = change[2]
+    return f"{kind} [{number + 1}] {row[0]}: {row[1]!r}"
+
+
+def watch(file_path, backend='pyyaml', interval=0.2, out=sys.stdout):
+    flattener = IncrementalFlattener(backend)
+    last = None
+    while True:
+        try:
+            stat = os.stat(file_path)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            signature = None
+        if signature != last and signature is not None:
+            last = signature
+            # Read rather than mmap: an editor truncating the file in place
+            # would turn reads of a live mapping into SIGBUS.
+            with open(file_path, 'rb') as file:
+                data = file.read()
+            start = time.perf_counter()
+            try:
+                changes = flattener.update(data)
+            except Exception as error:
+                print(f"! {type(error).__name__}: {error}".splitlines()[0], file=out)
+            else:
+                elapsed = (time.perf_counter() - start) * 1000
+                for change in changes:
+                    print(format_change(change), file=out)
+                print(f"# {len(changes)} changes, {flattener.parsed} sections parsed, {elapsed:.1f} ms",
+                      file=out)
+            out.flush()
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print row changes of a YAML file as it is edited.')
+    parser.add_argument('file')
+    parser.add_argument('--backend', default='pyyaml', choices=['pyyaml', 'ruamel'])
+    parser.add_argument('--interval', type=float, default=0.2, help='seconds between checks')
+    args = parser.parse_args(argv)
+    try:
+        watch(args.file, args.backend, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()